@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+#
+#	BSD 3-Clause License
+#
+#   Copyright (c) 2022, Jerry Evans
+#   All rights reserved.
+#   See LICENCE.md for full details
+#
+#   DOT generation time and peak memory for a large synthetic class graph,
+#   the previous build-a-string generator vs. streaming to the file.
+#
+#   python bench/bench_dotgen.py [-n classes] [-f fields per class]
+#
+
+import os
+import re
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import html
+from src.model import UmlClass, PUBLIC, PROTECTED, PRIVATE
+from src.umlgen import DotGenerator, splitQualifiedName
+
+#------------------------------------------------------------------------------
+class LegacyDot:
+	""" the previous DOT generation: every piece concatenated with +=, the whole
+	file as one string, then a whitespace fixup. over the current class model """
+
+	ropen = "\n<tr><td>\n"
+	rclose = "\n</td></tr>\n"
+
+	def __init__(self, classes : dict):
+		self.classes = classes
+
+	def _genFields(self, accessPrefix, fields) -> str:
+		ret = ""
+		if len(fields) > 0:
+			ret = self.ropen
+			for fieldName, fieldTypes in fields:
+				ret += f"{accessPrefix} {html.escape(fieldName)} : {html.escape(fieldTypes[0])} <br />"
+			ret += self.rclose
+		return ret
+
+	def _genMethods(self, accessPrefix, methods) -> str:
+		ret = ""
+		if len(methods) > 0:
+			ret = self.ropen
+			for (static, virtual, returnType, methodName, methodArgs) in methods:
+				ret += f"{accessPrefix} {static} {virtual} {html.escape(methodName)}{html.escape(methodArgs)} : {html.escape(returnType)} <br />"
+			ret += self.rclose
+		return ret
+
+	def generateDot(self, c : UmlClass) -> str:
+		ret = f"{c.getId()}[ label = <<table border=\"0\" rows=\"*\">"
+		ret += f"{self.ropen}{html.escape(c.getUQN())}{self.rclose}"
+		ret += f"\n<tr><td href=\"file:///{c.filename}\">\n{c.filename}:{c.line}{self.rclose}"
+		for access in (PUBLIC, PROTECTED, PRIVATE):
+			ret += f"{self._genFields(access, c.getFields(access))}"
+			ret += f"{self._genMethods(access, c.getMethods(access))}"
+		ret += "</table>> ]\n"
+		return ret
+
+	def _genAssociations(self, c : UmlClass, fields) -> dict:
+		astr:str = "[constraint=false, arrowtail=odiamond]\n"
+		mstr:str = "[constraint=false, arrowtail=diamond]\n"
+		edges = dict()
+		for fieldName, fieldTypes in fields:
+			for fieldType in fieldTypes:
+				if fieldType in self.classes:
+					key = self.classes[fieldType].getId()
+					if key in edges:
+						edges[key] = f"{key} -> {c.getId()} {mstr}"
+					else:
+						edges[key] = f"{key} -> {c.getId()} {astr}"
+		return edges
+
+	def genAssociations(self, c : UmlClass) -> str:
+		associations:str = ""
+		for fields in (c.getFields(PRIVATE), c.getFields(PUBLIC)):
+			for k,v in self._genAssociations(c, fields).items():
+				associations += v
+		return associations
+
+	def genInheritances(self, c : UmlClass) -> str:
+		edges = ""
+		for parent in c.parents:
+			if parent in self.classes:
+				edges += f"{self.classes[parent].getId()} -> {c.getId()}\n"
+		return edges
+
+	def genNamespaces(self, sortedClasses : list) -> str:
+		root = { "children" : {}, "ids" : [] }
+		for umlClass in sortedClasses:
+			scopes = splitQualifiedName(umlClass.fqn)[:-1]
+			if len(scopes) == 0:
+				continue
+			node = root
+			for scope in scopes:
+				node = node["children"].setdefault(scope, { "children" : {}, "ids" : [] })
+			node["ids"].append(umlClass.getId())
+		nameSpaces = ""
+		cluster = 0
+		pending = [ (name, root["children"][name], False) for name in sorted(root["children"], reverse=True) ]
+		while len(pending) > 0:
+			label, node, closing = pending.pop()
+			if closing:
+				nameSpaces += "}\n"
+				continue
+			ids = " ".join(node["ids"])
+			if not nameSpaces.endswith("\n"):
+				nameSpaces += "\n"
+			nameSpaces += f"subgraph cluster_{cluster} {{ label=\"{label}\" {ids} "
+			cluster += 1
+			pending.append((label, node, True))
+			for name in sorted(node["children"], reverse=True):
+				pending.append((name, node["children"][name], False))
+		return nameSpaces
+
+	def generate(self) -> str:
+		sortedClasses = [ self.classes[key] for key in sorted(self.classes) ]
+		classes = ""
+		for value in sortedClasses:
+			classes += self.generateDot(value)
+		associations = ""
+		for c in sortedClasses:
+			associations += self.genAssociations(c)
+		inheritances = ""
+		for c in sortedClasses:
+			inheritances += self.genInheritances(c)
+		namespaces = self.genNamespaces(sortedClasses)
+		dotContent = f"""
+					// Paste into https://graphviz.christine.website/ to experiment. great stuff.
+					digraph UML {{
+						node [fontname = \"Helvetica,Arial,sans-serif\" margin=0 fontcolor=black fontsize=8 width=0.5 shape=box style=filled]
+						edge [fontname = \"Helvetica,Arial,sans-serif\" fontsize = 8 dir=back, arrowtail=empty]
+						// classes
+						{classes}
+						// has-a (uses/ownership/association)
+						{associations}
+						// is-a (inheritance)
+						{inheritances}
+						// subgraphs for namespaces
+						{ namespaces }
+						//
+						}} // EOF\n
+						"""
+		return re.sub(r'(^[ \t]+|[ \t]+(?=:))', '', dotContent, flags=re.M)
+
+#------------------------------------------------------------------------------
+def makeClass(fqn : str, parents : list, fields : list, methods : list) -> UmlClass:
+	""" a UmlClass without a clang cursor behind it """
+	c = UmlClass()
+	c.filename = f"/src/{fqn.replace('::', '/')}.h"
+	c.line = 1
+	c.fqn = fqn
+	c.setMembers(parents, fields, methods)
+	return c
+
+#------------------------------------------------------------------------------
+def makeGenerator(count : int, fieldCount : int) -> DotGenerator:
+	""" count classes over 100 namespaces, each with a base and some members
+	referring to their neighbours """
+	generator = DotGenerator()
+	names = [ f"ns{i % 100}::sub{i % 7}::Class{i}" for i in range(count) ]
+	for i, fqn in enumerate(names):
+		parents = [ names[i // 2] ] if i > 0 else []
+		fields = [ ("-", f"_m{j}", [ names[(i + j + 1) % count] ]) for j in range(fieldCount) ]
+		methods = [ ("+", "static", "", "int", f"get{j}", "(const std::string &) const") for j in range(fieldCount) ]
+		generator.addClass(makeClass(fqn, parents, fields, methods))
+	return generator
+
+#------------------------------------------------------------------------------
+def writeString(generator : DotGenerator, fileName : str) -> None:
+	""" the previous way: the whole file as one string, then written """
+	content = LegacyDot(generator.classes).generate()
+	with open(fileName, "w") as f:
+		f.write(content)
+
+#------------------------------------------------------------------------------
+def writeStream(generator : DotGenerator, fileName : str) -> None:
+	""" straight to the file """
+	with open(fileName, "w") as f:
+		generator.write(f, True)
+
+#------------------------------------------------------------------------------
+def measure(fn, generator : DotGenerator, fileName : str) -> tuple:
+	""" (seconds, peak traced bytes, file size) """
+	tracemalloc.start()
+	start = time.perf_counter()
+	fn(generator, fileName)
+	seconds = time.perf_counter() - start
+	current, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	return seconds, peak, os.path.getsize(fileName)
+
+#------------------------------------------------------------------------------
+def main():
+	parser = argparse.ArgumentParser(description="cppuml DOT generation benchmark")
+	parser.add_argument("-n", type=int, default=10000, help="number of classes")
+	parser.add_argument("-f", type=int, default=4, help="fields and methods per class")
+	opts = parser.parse_args()
+	root = tempfile.mkdtemp(prefix="cppuml-bench-")
+	try:
+		generator = makeGenerator(opts.n, opts.f)
+		mb = lambda b: f"{b / (1024 * 1024):8.1f}MB"
+		print(f"{opts.n} class(es), {opts.f} field(s) and method(s) each")
+		for label, fn in (("string", writeString), ("stream", writeStream)):
+			seconds, peak, size = measure(fn, generator, os.path.join(root, f"{label}.dot"))
+			print(f"{label}: {seconds:6.2f}s, peak {mb(peak)} for {mb(size)} of DOT")
+		with open(os.path.join(root, "string.dot")) as a, open(os.path.join(root, "stream.dot")) as b:
+			print("same output" if a.read() == b.read() else "DIFFERENT output")
+	finally:
+		shutil.rmtree(root, ignore_errors=True)
+
+#------------------------------------------------------------------------------
+if __name__ == "__main__":
+	main()
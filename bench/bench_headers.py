@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+#
+#	BSD 3-Clause License
+#
+#   Copyright (c) 2022, Jerry Evans
+#   All rights reserved.
+#   See LICENCE.md for full details
+#
+#   Parse counts and times for a synthetic many-TU tree: every TU (headermode=off)
+#   vs. a covering subset of the TUs (cover) vs. each header on its own (stubs).
+#   All three must find the same classes.
+#
+#   python bench/bench_headers.py [-n TUs] [-H headers] [-i includes per TU] [-l path/to/libclang]
+#
+
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from clang.cindex import Config
+from src.extractor import Extractor
+from src.exclusions import ExclusionFilter
+from src.includes import IncludeGraph
+
+#------------------------------------------------------------------------------
+def writeTree(root : str, tus : int, headers : int, perTu : int) -> list:
+	""" headers with a few classes each, including a couple of earlier headers,
+	and TUs including a random handful of them. returns the TU names """
+	include = os.path.join(root, "include")
+	os.makedirs(include)
+	rng = random.Random(42)
+	for h in range(headers):
+		with open(os.path.join(include, f"h{h}.h"), "w") as f:
+			f.write("#pragma once\n")
+			deps = rng.sample(range(h), min(h, 2))
+			for d in deps:
+				f.write(f"#include \"h{d}.h\"\n")
+			f.write(f"namespace lib{h % 10} {{\n")
+			for c in range(4):
+				held = f"lib{deps[0] % 10}::H{deps[0]}C0" if len(deps) > 0 else "int"
+				f.write(f"class H{h}C{c} {{ {held} _held; const char* _name; public: H{h}C{c}() {{}} int get{c}() const; }};\n")
+			f.write("}\n")
+	files = []
+	for n in range(tus):
+		name = os.path.join(root, f"tu{n}.cpp")
+		with open(name, "w") as f:
+			for h in rng.sample(range(headers), min(headers, perTu)):
+				f.write(f"#include \"h{h}.h\"\n")
+			f.write(f"int f{n}() {{ return {n}; }}\n")
+		files.append(name)
+	return files
+
+#------------------------------------------------------------------------------
+def parseUnits(units : list) -> tuple:
+	""" parse like the application does, first seen wins. returns (seconds, fully qualified names) """
+	extractor = Extractor({})
+	exclusions = ExclusionFilter([], [])
+	known = {}
+	start = time.perf_counter()
+	for fileName, clangArgs in units:
+		for umlClass in extractor.extract(fileName, clangArgs, exclusions, known):
+			known[umlClass.fqn] = umlClass
+	return time.perf_counter() - start, set(known)
+
+#------------------------------------------------------------------------------
+def main():
+	parser = argparse.ArgumentParser(description="cppuml header-centric extraction benchmark")
+	parser.add_argument("-n", type=int, default=200, help="number of TUs")
+	parser.add_argument("-H", type=int, default=40, help="number of headers")
+	parser.add_argument("-i", type=int, default=6, help="headers included by each TU")
+	parser.add_argument("-l", default="", help="path to libclang")
+	opts = parser.parse_args()
+	if opts.l:
+		Config.set_library_file(opts.l)
+	root = tempfile.mkdtemp(prefix="cppuml-bench-")
+	try:
+		files = writeTree(root, opts.n, opts.H, opts.i)
+		clangArgs = [ "-x", "c++", "-std=c++17", "-I" + os.path.join(root, "include") ]
+		units = [ (name, clangArgs) for name in files ]
+		graph = IncludeGraph([ "/usr" ])
+		start = time.perf_counter()
+		covering = graph.cover(units)
+		coverSeconds = time.perf_counter() - start
+		start = time.perf_counter()
+		stubs = graph.stubs(units)
+		stubSeconds = time.perf_counter() - start
+		print(f"{opts.n} TU(s), {opts.H} header(s), {opts.i} include(s) per TU")
+		reference = None
+		for label, selected, scan in (("off", units, 0.0), ("cover", covering, coverSeconds), ("stubs", stubs, stubSeconds)):
+			seconds, names = parseUnits(selected)
+			reference = names if reference is None else reference
+			same = "same classes" if names == reference else f"DIFFERENT classes ({len(names)} vs {len(reference)})"
+			print(f"{label:6}: {len(selected):5} parse(s) {seconds:7.2f}s + {scan:.3f}s include scan. {len(names)} class(es), {same}")
+	finally:
+		shutil.rmtree(root, ignore_errors=True)
+
+#------------------------------------------------------------------------------
+if __name__ == "__main__":
+	main()
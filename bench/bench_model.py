@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+#
+#	BSD 3-Clause License
+#
+#   Copyright (c) 2022, Jerry Evans
+#   All rights reserved.
+#   See LICENCE.md for full details
+#
+#   Peak RSS holding a large synthetic class model: the previous per-instance
+#   dict/list layout vs. the __slots__ UmlClass with interned strings.
+#   Each layout is measured in a process of its own.
+#
+#   python bench/bench_model.py [-n classes]
+#
+
+import os
+import sys
+import time
+import resource
+import argparse
+import subprocess
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from src.model import UmlClass
+
+#------------------------------------------------------------------------------
+class LegacyClass:
+	""" the previous UmlClass layout, minus the clang processing """
+
+	def __init__(self, fqn : str, filename : str):
+		self.generate_href = True
+		self.ropen = "\n<tr><td>\n"
+		self.rclose = "\n</td></tr>\n"
+		self.filename = filename
+		self.relname = ""
+		self.line = 1
+		self.isDefinition = True
+		self.fqn = fqn
+		self.parents = []
+		self.privateFields = []
+		self.privateMethods = []
+		self.publicFields = []
+		self.publicMethods = []
+		self.protectedFields = []
+		self.protectedMethods = []
+
+#------------------------------------------------------------------------------
+def fresh(*parts) -> str:
+	""" a new string object each time, as every libclang spelling is """
+	return "".join(parts)
+
+#------------------------------------------------------------------------------
+# the same handful of spellings turn up in class after class
+typeNames = [ "int", "bool", "double", "std::string", "std::vector<int>", "const char *", "size_t" ] + \
+	[ f"ns{i}::Type{i}" for i in range(200) ]
+
+#------------------------------------------------------------------------------
+def members(i : int) -> tuple:
+	""" (parents, fields, methods) for class i as the extractor would see them """
+	parents = [ fresh("ns", str(i % 100), "::Base", str(i % 50)) ]
+	fields = []
+	for j in range(4):
+		t = typeNames[(i + j) % len(typeNames)]
+		fields.append(("-+#"[j % 3], fresh("_m", str(j)), [ fresh(t) ]))
+	methods = []
+	for j in range(6):
+		t = typeNames[(i * 7 + j) % len(typeNames)]
+		methods.append(("+", "", "virtual" if j == 0 else "", fresh(t), fresh("get", str(j)), fresh("(const ", t, " &) const")))
+	return parents, fields, methods
+
+#------------------------------------------------------------------------------
+def buildLegacy(count : int) -> list:
+	classes = []
+	for i in range(count):
+		c = LegacyClass(fresh("ns", str(i % 100), "::Class", str(i)), fresh("/src/include/header", str(i % 500), ".h"))
+		parents, fields, methods = members(i)
+		c.parents = parents
+		lists = { "+" : (c.publicFields, c.publicMethods), "#" : (c.protectedFields, c.protectedMethods), "-" : (c.privateFields, c.privateMethods) }
+		for access, name, types in fields:
+			lists[access][0].append((name, types))
+		for access, static, virtual, returnType, name, arguments in methods:
+			lists[access][1].append((static, virtual, returnType, name, arguments))
+		classes.append(c)
+	return classes
+
+#------------------------------------------------------------------------------
+def buildCompact(count : int) -> list:
+	classes = []
+	for i in range(count):
+		c = UmlClass()
+		c.fqn = sys.intern(fresh("ns", str(i % 100), "::Class", str(i)))
+		c.filename = sys.intern(fresh("/src/include/header", str(i % 500), ".h"))
+		c.line = 1
+		c.setMembers(*members(i))
+		classes.append(c)
+	return classes
+
+#------------------------------------------------------------------------------
+def peakRss() -> int:
+	""" peak resident set size in bytes """
+	rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# kilobytes on Linux, bytes on macOS
+	return rss if sys.platform == "darwin" else rss * 1024
+
+#------------------------------------------------------------------------------
+def child(layout : str, count : int) -> None:
+	""" build one layout and report on stdout """
+	before = peakRss()
+	start = time.perf_counter()
+	classes = (buildLegacy if layout == "legacy" else buildCompact)(count)
+	seconds = time.perf_counter() - start
+	print(f"{layout} {before} {peakRss()} {seconds}")
+
+#------------------------------------------------------------------------------
+def main():
+	parser = argparse.ArgumentParser(description="cppuml class model memory benchmark")
+	parser.add_argument("-n", type=int, default=50000, help="number of classes")
+	parser.add_argument("--child", default="", help=argparse.SUPPRESS)
+	opts = parser.parse_args()
+	if opts.child:
+		child(opts.child, opts.n)
+		return
+	mb = lambda b: f"{b / (1024 * 1024):8.1f}MB"
+	print(f"{opts.n} class(es)")
+	for layout in ("legacy", "compact"):
+		out = subprocess.run([sys.executable, os.path.abspath(__file__), "-n", str(opts.n), "--child", layout],
+			capture_output=True, text=True, check=True).stdout.split()
+		before, after, seconds = int(out[1]), int(out[2]), float(out[3])
+		print(f"{layout:8}: peak RSS {mb(after)} ({mb(after - before)} for the model), built in {seconds:.2f}s")
+
+#------------------------------------------------------------------------------
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+#
+#	BSD 3-Clause License
+#
+#   Copyright (c) 2022, Jerry Evans
+#   All rights reserved.
+#   See LICENCE.md for full details
+#
+#   Per-TU parse time with and without a precompiled prefix header.
+#
+#   python bench/bench_pch.py [-n TUs] [-c prefix classes] [-l path/to/libclang]
+#
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from clang.cindex import Config
+from src.extractor import Extractor
+from src.pch import PrecompiledHeader
+from src.exclusions import ExclusionFilter
+
+#------------------------------------------------------------------------------
+# test.cpp style TU. classes in a namespace, inheritance and association.
+tu_template = """
+#include "prefix.h"
+namespace test{n}
+{{
+class A {{ prefix::C0* _p; public: A() {{}} }};
+class B {{ A _a; public: B() {{}} static B* factory(const char* name) {{ return nullptr; }} }};
+class C : public B {{ public: C() {{}} }};
+class D : public B {{ public: D() {{}} }};
+class E : public C, public D {{ public: E() {{}} }};
+}}
+"""
+
+#------------------------------------------------------------------------------
+def writeTree(root : str, tus : int, classes : int) -> list:
+	""" a heavy prefix header and a set of TUs that include it """
+	with open(os.path.join(root, "prefix.h"), "w") as f:
+		f.write("#pragma once\nnamespace prefix {\n")
+		for i in range(classes):
+			f.write(f"template <typename T> class T{i} {{ T _t; public: T get() const {{ return _t; }} }};\n")
+			f.write(f"class C{i} {{ T{i}<int> _a; T{i}<double> _b; public: virtual ~C{i}() {{}} int f{i}(int x) const; }};\n")
+		f.write("}\n")
+	files = []
+	for n in range(tus):
+		name = os.path.join(root, f"tu{n}.cpp")
+		with open(name, "w") as f:
+			f.write(tu_template.format(n=n))
+		files.append(name)
+	return files
+
+#------------------------------------------------------------------------------
+def timeParses(extractor : Extractor, files : list, clangArgs : list, pch : str) -> list:
+	""" per TU wall time in seconds """
+	times = []
+	exclusions = ExclusionFilter(["prefix"], [])
+	for name in files:
+		start = time.perf_counter()
+		classes = extractor.extract(name, clangArgs, exclusions, pch=pch)
+		times.append(time.perf_counter() - start)
+		assert len(classes) == 5, f"{name}: {len(classes)} classes"
+	return times
+
+#------------------------------------------------------------------------------
+def main():
+	parser = argparse.ArgumentParser(description="cppuml PCH benchmark")
+	parser.add_argument("-n", type=int, default=20, help="number of TUs")
+	parser.add_argument("-c", type=int, default=2000, help="classes in the prefix header")
+	parser.add_argument("-l", default="", help="path to libclang")
+	opts = parser.parse_args()
+	if opts.l:
+		Config.set_library_file(opts.l)
+	root = tempfile.mkdtemp(prefix="cppuml-bench-")
+	try:
+		files = writeTree(root, opts.n, opts.c)
+		args = { "generatehref" : "true", "directory" : root, "verbosity" : "0" }
+		extractor = Extractor(args)
+		clangArgs = [ "-x", "c++", "-std=c++17" ]
+		# baseline
+		plain = timeParses(extractor, files, clangArgs, None)
+		# build once, then reuse
+		start = time.perf_counter()
+		pch = PrecompiledHeader(os.path.join(root, "prefix.h"), extractor.getIndex)
+		pchName = pch.get(clangArgs)
+		build = time.perf_counter() - start
+		withPch = timeParses(extractor, files, clangArgs, pchName)
+		pch.cleanup()
+		ms = lambda t: f"{1000 * t:8.1f}ms"
+		print(f"{opts.n} TU(s), {opts.c} prefix class(es)")
+		print(f"without PCH: {ms(sum(plain) / len(plain))} per TU, {ms(sum(plain))} total")
+		print(f"with PCH   : {ms(sum(withPch) / len(withPch))} per TU, {ms(sum(withPch) + build)} total including {ms(build)} to build")
+	finally:
+		shutil.rmtree(root, ignore_errors=True)
+
+#------------------------------------------------------------------------------
+if __name__ == "__main__":
+	main()
@@ -7,7 +7,6 @@ import os
 import sys
 import traceback
 from src.dbmsg import dbmsg
-from src.cppuml_clang import Application
 
 #------------------------------------------------------------------------------
 if __name__ == "__main__":
@@ -17,9 +16,15 @@ if __name__ == "__main__":
 		#
 		# dbmsg.debug(f"{sys.executable} {os.getcwd()} => {sys.argv[0]} ")
 		#
-		app = Application(sys.argv)
-		#
-		app.run()
+		# a thin client for a resident server. no libclang here.
+		if len(sys.argv) > 1 and sys.argv[1] == "client":
+			from src.server import clientMain
+			ret = clientMain(sys.argv[2:])
+		else:
+			from src.cppuml_clang import Application
+			app = Application(sys.argv)
+			#
+			app.run()
 
 	except Exception:
 		# just GTF out of Dodge
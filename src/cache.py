@@ -0,0 +1,142 @@
+#
+#	BSD 3-Clause License
+#
+#   Copyright (c) 2022, Jerry Evans
+#   All rights reserved.
+#   See LICENCE.md for full details
+#
+
+import os
+import pickle
+import hashlib
+import tempfile
+from .dbmsg import dbmsg
+
+#------------------------------------------------------------------------------
+class ExtractionCache:
+	""" Persistent, content addressed cache of the UmlClass records extracted from a TU.
+
+	A manifest, keyed on the source file name plus the clang arguments and
+	extraction settings, lists the include sets seen for that TU. Each entry maps
+	the content digests of the source and all of its includes to an object
+	holding the serialized UmlClass records. """
+
+	# bump this if the UmlClass layout changes
+	version = 3
+	# how many include sets are remembered per manifest
+	maxEntries = 8
+
+	#--------------------------------------------------------------------------
+	def __init__(self, cacheDir : str):
+		""" constructor """
+		self.cacheDir = os.path.abspath(cacheDir)
+		self.manifestDir = os.path.join(self.cacheDir, "manifests")
+		self.objectDir = os.path.join(self.cacheDir, "objects")
+		os.makedirs(self.manifestDir, exist_ok=True)
+		os.makedirs(self.objectDir, exist_ok=True)
+		# filename -> content digest. headers are shared so only hash them once per run.
+		self.digests = {}
+		# dependencies of the last hit
+		self.includes = None
+		self.hits = 0
+		self.misses = 0
+
+	#--------------------------------------------------------------------------
+	def _digest(self, fileName : str) -> str:
+		""" content digest of a file, None if it cannot be read """
+		digest = self.digests.get(fileName)
+		if digest is None:
+			try:
+				with open(fileName, "rb") as f:
+					digest = hashlib.sha256(f.read()).hexdigest()
+			except OSError:
+				digest = ""
+			self.digests[fileName] = digest
+		return digest if digest != "" else None
+
+	#--------------------------------------------------------------------------
+	def _manifestKey(self, filePath : str, clangArgs : list, settings : list) -> str:
+		""" key covering the TU name, the exact clang args and anything else that shapes the output """
+		h = hashlib.sha256(f"cppuml-cache-{self.version}".encode())
+		for s in [os.path.abspath(filePath)] + list(clangArgs) + list(settings):
+			h.update(b"\0")
+			h.update(str(s).encode())
+		return h.hexdigest()
+
+	#--------------------------------------------------------------------------
+	def _objectKey(self, manifestKey : str, deps : dict) -> str:
+		""" the content address of one extraction result """
+		h = hashlib.sha256(manifestKey.encode())
+		for fileName in sorted(deps):
+			h.update(f"\0{fileName}\0{deps[fileName]}".encode())
+		return h.hexdigest()
+
+	#--------------------------------------------------------------------------
+	def _load(self, fileName : str):
+		""" unpickle a cache file, None if missing or damaged """
+		try:
+			with open(fileName, "rb") as f:
+				return pickle.load(f)
+		except Exception:
+			return None
+
+	#--------------------------------------------------------------------------
+	def _save(self, fileName : str, value) -> None:
+		""" pickle to a cache file. atomic so concurrent runs never see a partial write """
+		fd, tmpName = tempfile.mkstemp(dir=os.path.dirname(fileName))
+		try:
+			with os.fdopen(fd, "wb") as f:
+				pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+			os.replace(tmpName, fileName)
+		except Exception:
+			if os.path.exists(tmpName):
+				os.remove(tmpName)
+			raise
+
+	#--------------------------------------------------------------------------
+	def lookup(self, filePath : str, clangArgs : list, settings : list):
+		""" return the cached list of UmlClass records for a TU, or None """
+		manifestKey = self._manifestKey(filePath, clangArgs, settings)
+		manifest = self._load(os.path.join(self.manifestDir, manifestKey))
+		if manifest is not None:
+			for deps in manifest:
+				# every dependency must still have the same content
+				if all(self._digest(fileName) == digest for fileName, digest in deps.items()):
+					classes = self._load(os.path.join(self.objectDir, self._objectKey(manifestKey, deps)))
+					if classes is not None:
+						self.hits += 1
+						self.includes = list(deps)
+						return classes
+		self.misses += 1
+		return None
+
+	#--------------------------------------------------------------------------
+	def store(self, filePath : str, clangArgs : list, settings : list, includes : list, classes : list) -> None:
+		""" cache the UmlClass records extracted from a TU which included the given headers """
+		deps = {}
+		for fileName in [filePath] + list(includes):
+			digest = self._digest(fileName)
+			if digest is None:
+				# vanished under our feet. do not cache.
+				return
+			deps[fileName] = digest
+		manifestKey = self._manifestKey(filePath, clangArgs, settings)
+		manifestName = os.path.join(self.manifestDir, manifestKey)
+		try:
+			self._save(os.path.join(self.objectDir, self._objectKey(manifestKey, deps)), classes)
+			manifest = self._load(manifestName) or []
+			manifest = [ d for d in manifest if d != deps ]
+			manifest.insert(0, deps)
+			self._save(manifestName, manifest[:self.maxEntries])
+		except OSError as e:
+			dbmsg.debug(f"Cannot write cache {self.cacheDir}: {e}")
+
+	#--------------------------------------------------------------------------
+	def refresh(self) -> None:
+		""" files may have changed since we hashed them """
+		self.digests = {}
+
+	#--------------------------------------------------------------------------
+	def summary(self) -> str:
+		""" hit/miss report """
+		return f"Cache {self.cacheDir}: {self.hits} hit(s), {self.misses} miss(es)"
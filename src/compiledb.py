@@ -0,0 +1,114 @@
+#
+#	BSD 3-Clause License
+#
+#   Copyright (c) 2022, Jerry Evans
+#   All rights reserved.
+#   See LICENCE.md for full details
+#
+
+import os
+import fnmatch
+from clang.cindex import CompilationDatabase, CompilationDatabaseError
+from .dbmsg import dbmsg
+
+#------------------------------------------------------------------------------
+class CompileDatabase:
+	""" Source files and their exact clang arguments from a compile_commands.json """
+
+	# compiler driver options that make no sense to libclang. these take a value.
+	dropWithValue = { "-o", "-MF", "-MT", "-MQ" }
+	# ... and these do not
+	dropAlone = { "-c", "-M", "-MM", "-MD", "-MMD", "-MP", "-MG" }
+	# options naming a file or directory. relative names are relative to the build directory.
+	pathOptions = { "-I", "-isystem", "-iquote", "-idirafter", "-include", "-imacros", "-isysroot", "--sysroot" }
+	# ... and those that may have it joined on, i.e. -Idir. -include and friends are not
+	# among them: -include-pch is a different option altogether.
+	joinedPathOptions = ( "-I", "-isystem", "-iquote", "-idirafter", "--sysroot=" )
+
+	#--------------------------------------------------------------------------
+	def __init__(self, buildDir : str):
+		""" load compile_commands.json from a build directory """
+		self.buildDir = os.path.abspath(buildDir)
+		try:
+			self.db = CompilationDatabase.fromDirectory(self.buildDir)
+		except CompilationDatabaseError:
+			raise Exception(f"Cannot load compile_commands.json from {self.buildDir}")
+
+	#--------------------------------------------------------------------------
+	def _cleanArgs(self, directory : str, filename : str, arguments : list) -> tuple:
+		""" strip the compiler, the source and output names from a command line.
+		returns the clang args and the output (object) name, if any """
+		args = []
+		output = ""
+		# arguments[0] is the compiler itself
+		i = 1
+		while i < len(arguments):
+			arg = arguments[i]
+			value = arguments[i + 1] if i + 1 < len(arguments) else None
+			i += 1
+			# a PCH built by the compiler will not load into our libclang. drop it,
+			# including CMake's -Xclang -include-pch -Xclang file
+			if arg == "-include-pch":
+				i += 1
+				continue
+			if arg == "-Xclang":
+				if value == "-include-pch":
+					i += 3
+				# anything else is for the frontend, as is
+				elif value is not None:
+					args += [ arg, value ]
+					i += 1
+				continue
+			if arg in self.pathOptions:
+				args.append(arg)
+				if value is not None:
+					args.append(os.path.normpath(os.path.join(directory, value)))
+					i += 1
+				continue
+			option = next((o for o in self.joinedPathOptions if arg.startswith(o)), None)
+			if option is not None:
+				args.append(option + os.path.normpath(os.path.join(directory, arg[len(option):])))
+				continue
+			if arg in self.dropWithValue:
+				if arg == "-o" and value is not None:
+					output = value
+				i += 1
+				continue
+			if arg.startswith("-o") and len(arg) > 2:
+				output = arg[2:]
+				continue
+			if arg in self.dropAlone or arg == "--":
+				continue
+			if os.path.normpath(os.path.join(directory, arg)) == filename:
+				continue
+			args.append(arg)
+		if output:
+			output = os.path.normpath(os.path.join(directory, output))
+		return args, output
+
+	#--------------------------------------------------------------------------
+	def getCommands(self, patterns : list = None, exclusions : list = None) -> list:
+		""" list of (source file, clang args) in database order.
+		patterns are fnmatch style and are tested against the source file and
+		its object file, so a CMake target can be picked with e.g. '*/mytarget.dir/*'.
+		no patterns == everything """
+		patterns = patterns or []
+		exclusions = exclusions or []
+		commands = []
+		seen = set()
+		for cmd in self.db.getAllCompileCommands():
+			directory = cmd.directory
+			filename = os.path.normpath(os.path.join(directory, cmd.filename))
+			# the same file may be built more than once. first wins.
+			if filename in seen:
+				continue
+			if os.path.basename(filename) in exclusions:
+				continue
+			args, output = self._cleanArgs(directory, filename, list(cmd.arguments))
+			if len(patterns) > 0:
+				if not any(fnmatch.fnmatch(filename, p) or (output and fnmatch.fnmatch(output, p)) for p in patterns):
+					continue
+			seen.add(filename)
+			commands.append((filename, args))
+		dbmsg.debug(f"{self.buildDir}: {len(commands)} compile command(s) selected")
+		return commands
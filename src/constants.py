@@ -16,6 +16,17 @@ class constants:
 	outfile = 'outfile'
 	recursive = 'recursive'
 	verbosity = 'verbosity'
+	logfile = 'logfile'
+	stats = 'stats'
+	export = 'export'
+	queryroot = 'queryroot'
+	queryhops = 'queryhops'
+	querydirection = 'querydirection'
+	querymaxnodes = 'querymaxnodes'
+	# command line only
+	renderonly = 'renderonly'
+	serve = 'serve'
+	watch = 'watch'
 	ignorefilters = 'ignorefilters'
 	clangpath = 'clangpath'
 	clangstandard = 'clangstandard'
@@ -25,9 +36,33 @@ class constants:
 	excludefilepath = 'excludefilepath'
 	excludenamespace = 'excludenamespace'
 	exclusions = 'exclusions'
+	prunedirs = 'prunedirs'
+	ignorefiles = 'ignorefiles'
 	libclangpath = "libclangpath"
+	jobs = 'jobs'
+	cachedir = 'cachedir'
+	compiledb = 'compiledb'
+	compiledbfilter = 'compiledbfilter'
+	prefixheader = 'prefixheader'
+	outputmode = 'outputmode'
+	renderjobs = 'renderjobs'
+	rendertimeout = 'rendertimeout'
+	partitionsize = 'partitionsize'
+	partitionby = 'partitionby'
+	renderprofile = 'renderprofile'
+	fastnodes = 'fastnodes'
+	layoutnodes = 'layoutnodes'
+	layoutengine = 'layoutengine'
+	watchmethod = 'watchmethod'
+	watchdelay = 'watchdelay'
+	headermode = 'headermode'
+	# outputmode values
+	outputPerFile = 'per-file'
+	outputProject = 'project'
 	# name of the ini file
 	ininame='cppuml.ini'
+	# default socket for serve and client, in the working folder
+	socketname='.cppuml.sock'
 
 	#--------------------------------------------------------------------------
 	# yakk. horrible.
@@ -43,21 +78,78 @@ class constants:
 	recursive=false
 	; types of files to search
 	filetypes=*.cpp,
-	; exclude specific files ...
+	; exclude specific files, by name or glob ...
 	exclusions=
-	; how much tracking info?
+	; with recursive=true, skip directories with these names or globs ...
+	prunedirs=.git,.svn,.hg,build,uml
+	; ... and whatever .gitignore files say to ignore
+	ignorefiles=true
+	; how much tracking info? 0 quiet, 1 clang diagnostics, 2 per file totals, 3+ every skipped class
 	verbosity=1
+	; write messages to this file as JSON lines instead of the console
+	logfile=
+	; write per phase timings and counters to this JSON file
+	stats=
+	; save the extracted classes. .jsonl for JSON lines, anything else for the binary form
+	export=
+	; focus each diagram on the classes matching a regex (empty == all) ...
+	queryroot=
+	; ... and those within this many inheritance/association steps of them. -1 == no limit
+	queryhops=-1
+	; both, ancestors (bases and held types) or descendants (subclasses and holders)
+	querydirection=both
+	; keep at most this many classes, nearest first. 0 == no limit
+	querymaxnodes=0
 	; macroised output file location. 
 	; cppuml will create the directory if required
 	outfile=$SRCDIR/uml/$SRCNAME.dot
+	; per-file: one diagram per source file holding the classes it can see
+	; project: one diagram for everything. $SRCDIR/$SRCNAME are the root directory and its name
+	outputmode=per-file
 	; add named boxed in UML
 	generatenamespaces=true
 	; filter out any classes in thse C++ namespaces (CSV list)
+	; a namespace matched outright is not walked at all, so its class templates go too
 	excludenamespace=std
 	; this is a quick override for all filters. 
 	ignorefilters=false
 	; add links into UML records
 	generatehref=true
+	; number of parallel parsing processes. 0 == all CPUs
+	jobs=1
+	; cache extracted classes here to skip unchanged files. empty to disable
+	cachedir=
+	; build directory holding compile_commands.json. if set, files and flags come from there
+	compiledb=
+	; only use compile commands whose source or object file matches (CSV list, i.e. */mytarget.dir/*)
+	compiledbfilter=
+	; common prefix header to precompile once and share between all files. empty to disable
+	prefixheader=
+	; outputmode=project only. cover: parse a small set of files that between them include
+	; every project header. stubs: parse each project header on its own. off: every file.
+	; classes from system headers are only seen where a chosen file happens to pull them in
+	headermode=off
+	; number of parallel dot (SVG rendering) processes
+	renderjobs=1
+	; give up on any single SVG after this many seconds. 0 == no limit
+	rendertimeout=0
+	; split diagrams with more than partitionsize classes into parts of up to that size,
+	; each rendered on its own, plus an index page. 0 == never
+	partitionsize=0
+	; components (connected classes stay together) or namespaces (one top-level namespace per part)
+	partitionby=components
+	; full (every member, with links), fast (names and member counts only) or auto
+	renderprofile=auto
+	; auto switches to fast above this many classes. 0 == never
+	fastnodes=2000
+	; above this many classes lay out with layoutengine (sfdp or neato) rather than dot. 0 == never
+	layoutnodes=5000
+	; also used when a full render hits rendertimeout and is redone with the fast profile
+	layoutengine=sfdp
+	; --watch: inotify, polling or auto (inotify if available)
+	watchmethod=auto
+	; seconds without further changes before reparsing
+	watchdelay=0.2
 
 	; all windows specific stuff hee
 	[win32]
@@ -16,15 +16,30 @@ from distutils.log import debug
 import sys
 import os
 from posixpath import dirname
-import fnmatch
-import re
-import ccsyspath
 import shutil
+import multiprocessing
+import hashlib
+import itertools
+import html
+import time
 #import clang.cindex
 from clang.cindex import Index, Config
 from configparser import ConfigParser
 from .constants import constants
 from .umlgen import *
+from .extractor import Extractor, initWorker, extractWorker
+from .cache import ExtractionCache
+from .compiledb import CompileDatabase
+from .pch import PrecompiledHeader
+from .render import Renderer
+from .stats import Stats
+from .exclusions import ExclusionFilter
+from .modelfile import ModelFile
+from .server import Server
+from .watch import createWatcher
+from .includes import IncludeGraph
+from .discovery import FileFinder
+from .syspaths import SystemIncludePaths
 from .dbmsg import dbmsg
 
 #------------------------------------------------------------------------------
@@ -37,6 +52,34 @@ class Application:
 		self.args = self.parse_args(argv)
 		if self.args == {}:
 			return
+		dbmsg.configure(int(self.args[constants.verbosity]), self.args.get(constants.logfile))
+		self.dotGenerator = DotGenerator(self.args[constants.generatehref] == "true")
+		# per phase timings and per TU counters
+		self.stats = Stats()
+		# diagrams skipped because nothing changed
+		self.unchanged = 0
+		# SVG generation runs alongside parsing
+		self.renderer = Renderer(int(self.args[constants.renderjobs]), float(self.args[constants.rendertimeout]))
+		self.pch = None
+		self.cache = None
+		# (source file, clang args) as last discovered, and source file -> names of the classes it saw
+		self.units = []
+		self.unitClasses = {}
+		# source file -> headers it pulled in
+		self.unitIncludes = {}
+		# headermode cover: (IncludeGraph, every unit it chose from), to make up for what the text scan got wrong
+		self.coverUnits = None
+		# DOT files written by the current run or update
+		self.written = []
+		# optional focus on part of the graph: (root regex, hops, direction, node cap)
+		self.query = None
+		query = (self.args.get(constants.queryroot, ""), int(self.args[constants.queryhops]),
+			self.args[constants.querydirection], int(self.args[constants.querymaxnodes]))
+		if query != ("", -1, "both", 0):
+			self.query = query
+		# re-rendering a saved model needs nothing else
+		if self.args.get(constants.renderonly):
+			return
 		# where is clang?
 		self.clang_path = self.args[constants.clangpath]
 		self.clang_path = shutil.which(self.clang_path)
@@ -50,121 +93,336 @@ class Application:
 		# set the path to libclang. this is important if we are using pyinst or similar
 		Config.set_library_file(self.libclangpath)
 		#
-		self.exclusions = self.args[constants.exclusions].split(",")
-		self.exclusions = [ s.strip() for s in self.exclusions ]
+		# which files to parse, and which directories not to look in
+		fileTypes = [ s.strip() for s in self.args[constants.filetypes].split(",") ]
+		exclusions = [ s.strip() for s in self.args[constants.exclusions].split(",") ]
+		pruneDirs = [ s.strip() for s in self.args[constants.prunedirs].split(",") ]
+		self.fileFinder = FileFinder(fileTypes, exclusions, pruneDirs,
+			self.args[constants.ignorefiles] == "true", self.args[constants.recursive] == "true")
+		self.exclusions = self.fileFinder.exclusions
 		# clear filter specs if we are ignoring them
 		if self.args[constants.ignorefilters] == "true":
 			self.args[constants.excludefilepath] = ""
-			self.args[constants.excludefamespace] = ""
-		# needs to be OS independent
-		if os.sys.platform == "linux" or os.sys.platform == "linux2":
-			self.clang_system_include_paths = [path.decode('utf-8') for path in ccsyspath.system_include_paths(self.clang_path)]
-		elif os.sys.platform == "darwin":
-			self.clang_system_include_paths = [path.decode('utf-8') for path in ccsyspath.system_include_paths(self.clang_path)]
-		elif os.sys.platform == "win32":
-			self.clang_system_include_paths = []
+			self.args[constants.excludenamespace] = ""
+		# compiled once, shared by every TU
+		excludeNamespace = [ s.strip() for s in self.args[constants.excludenamespace].split(",") ]
+		excludeFilepath = [ s.strip() for s in self.args[constants.excludefilepath].split(",") ]
+		self.exclusionFilter = ExclusionFilter(excludeNamespace, excludeFilepath)
+		# asking clang is slow. done once something is to be parsed, and remembered on disk
+		self.systemIncludePaths = SystemIncludePaths(self.clang_path, self.args.get(constants.cachedir))
 		#
-		self.index = clang.cindex.Index.create()
-		self.dotGenerator = DotGenerator()
-
-	#--------------------------------------------------------------------------
-	def _getFiles(self, rootDir, patterns, recursive = False) -> list:
-		""" Searches for files in rootDir which file names mathes the given pattern. Returns
-		a list of file paths of found files"""
-		recursive = (self.args[constants.recursive] == "true")
-		fqns = []
-		if not recursive:  
-			files = []
-			for filename in os.listdir( rootDir ):
-				files.append(filename)
-			for p in patterns:
-				for filename in fnmatch.filter(files, p):
-					if filename not in self.exclusions:
-						fqns.append(os.path.join(rootDir, filename))
-	
+		self.extractor = Extractor(self.args)
+		# optional precompiled prefix header. built on demand.
+		if self.args.get(constants.prefixheader):
+			self.pch = PrecompiledHeader(self.args[constants.prefixheader], self.extractor.getIndex)
+		# optional on-disk cache of extracted classes
+		if self.args.get(constants.cachedir):
+			self.cache = ExtractionCache(self.args[constants.cachedir])
+
+	#--------------------------------------------------------------------------
+	def _getFiles(self, rootDir : str):
+		""" yields the files in rootDir, and below if recursive, which are to be parsed.
+		found in name order, directory by directory """
+		yield from self.fileFinder.find(rootDir)
+		dbmsg.log(1, "%d director(ies) searched, %d pruned", self.fileFinder.directories, self.fileFinder.pruned)
+
+
+	#--------------------------------------------------------------------------
+	#
+	def _buildClangArgs(self, clangArgs : list, includeDirs : list) -> list:
+		""" the complete, canonical argument list for a TU: clangArgs plus include
+		and system include directories. include directories are made absolute and
+		each appears once, as do repeated defines. clangArgs is not modified. """
+		args = []
+		seen = set()
+		pending = None
+		for arg in clangArgs + ['-I' + includeDir for includeDir in includeDirs + self.systemIncludePaths.get()]:
+			# -I dir -> -Idir, -D X -> -DX
+			if pending is not None:
+				arg = pending + arg
+				pending = None
+			elif arg == '-I' or arg == '-D':
+				pending = arg
+				continue
+			if arg.startswith('-I'):
+				if arg == '-I' or arg[2:].strip() == "":
+					continue
+				arg = '-I' + os.path.normpath(os.path.abspath(arg[2:].strip()))
+			elif not arg.startswith('-D'):
+				# anything else may be an option value (i.e. -x c++), so keep it as is
+				args.append(arg)
+				continue
+			if arg not in seen:
+				seen.add(arg)
+				args.append(arg)
+		return args
+
+	#--------------------------------------------------------------------------
+	#
+	def _parseTranslationUnit(self, filePath : str, clangArgs : list, exclusions : ExclusionFilter) -> list:
+		""" parse a single source file with a complete argument list.
+		returns the names of all classes seen in it """
+		if self.cache is None:
+			pch = self.pch.get(clangArgs) if self.pch is not None else None
+			classes = self.extractor.extract(filePath, clangArgs, exclusions, self.dotGenerator.classes, pch)
+			self._addCounters(filePath, self.extractor.counters)
+			self._addIncludes(filePath, clangArgs, self.extractor.includes)
+			self._mergeClasses(classes)
+			return list(self.extractor.names)
+		settings = self._cacheSettings(exclusions)
+		classes = self.cache.lookup(filePath, clangArgs, settings)
+		if classes is None:
+			# cached results must hold every class in the TU, not just the new ones
+			pch = self.pch.get(clangArgs) if self.pch is not None else None
+			classes = self.extractor.extract(filePath, clangArgs, exclusions, pch=pch)
+			self._addCounters(filePath, self.extractor.counters)
+			self._addIncludes(filePath, clangArgs, self.extractor.includes)
+			if self.extractor.includes is not None:
+				self.cache.store(filePath, clangArgs, settings, self._cacheIncludes(clangArgs, self.extractor.includes), classes)
 		else:
-			for rootDir, dirs, files in os.walk(rootDir):
-				for p in patterns:
-					for filename in fnmatch.filter(files, p):
-						if filename not in self.exclusions:
-							fqns.append(os.path.join(rootDir, filename))
-		return fqns
+			self._addCounters(filePath, { "kept" : len(classes) }, True)
+			self.unitIncludes[filePath] = self.cache.includes
+		self._mergeClasses(classes)
+		return [ umlClass.fqn for umlClass in classes ]
 
+	#--------------------------------------------------------------------------
+	#
+	def _addCounters(self, sourceFile : str, counters : dict, cached : bool = False):
+		""" accumulate per TU extraction counts and timings """
+		self.stats.addUnit(sourceFile, counters, cached)
 
 	#--------------------------------------------------------------------------
-	def _processClass(self, cursor, excludeNamespaces : list, excludeFilepaths : list):
-		""" Processes an ast node that is a class. """
-		# 
-		generateHref = self.args[constants.generatehref] == "true"
-		absDirectory = self.args[constants.directory]
-		verbosity = int(self.args[constants.verbosity])
-		umlClass = UmlClass(cursor, absDirectory, generateHref)  
+	#
+	def _cacheSettings(self, exclusions : ExclusionFilter) -> list:
+		""" everything besides clang args that changes what gets extracted """
+		settings = [ self.args[constants.directory] ] + exclusions.namespaces + ["--"] + exclusions.filepaths
+		# a prefix header is seen by every TU, and is not among its includes
+		if self.pch is not None:
+			prefixHeader = os.path.abspath(self.args[constants.prefixheader])
+			settings += [ "--", prefixHeader, self._fileDigest(prefixHeader) ]
+		return settings
+
+	#--------------------------------------------------------------------------
+	#
+	def _cacheIncludes(self, clangArgs : list, includes : list) -> list:
+		""" clang does not report headers that came in via a PCH. add them back. """
+		if self.pch is None:
+			return includes
+		return includes + self.pch.getIncludes(clangArgs)
+
+	#--------------------------------------------------------------------------
+	#
+	def _addIncludes(self, sourceFile : str, clangArgs : list, includes : list):
+		""" remember what a TU pulled in, for working out what a change affects """
+		self.unitIncludes[sourceFile] = self._cacheIncludes(clangArgs, includes) if includes is not None else []
 
-		# JME should be an option.
-		if umlClass.isUnamed() or umlClass.isAnonymous():
+	#--------------------------------------------------------------------------
+	#
+	def _mergeClasses(self, classes : list):
+		""" map extracted classes. first seen wins, unless all we have is a forward declaration """
+		for umlClass in classes:
+			current = self.dotGenerator.classes.get(umlClass.fqn)
+			if current is None or (umlClass.isDefinition and not current.isDefinition):
+				self.dotGenerator.addClass(umlClass)
+
+	#--------------------------------------------------------------------------
+	#
+	def _parseTranslationUnits(self, units : list, exclusions : ExclusionFilter):
+		""" parse (source file, complete clang args) units. yields (source file, names of the classes seen in it)
+		for each file as its classes have been mapped """
+		jobs = int(self.args[constants.jobs])
+		if jobs <= 0:
+			jobs = os.cpu_count()
+		if jobs > 1:
+			# the pool needs them all up front
+			units = list(units)
+			jobs = min(jobs, len(units))
+		if jobs <= 1:
+			for sourceFile, clangArgs in units:
+				dbmsg.debug(f"Parsing {sourceFile}")
+				names = self._parseTranslationUnit(sourceFile, clangArgs, exclusions)
+				yield sourceFile, names
+			return
+		dbmsg.debug(f"Using {jobs} worker process(es)")
+		# satisfy what we can from the cache. the remainder goes to the pool.
+		cached = {}
+		if self.cache is not None:
+			settings = self._cacheSettings(exclusions)
+			for sourceFile, tuArgs in units:
+				classes = self.cache.lookup(sourceFile, tuArgs, settings)
+				if classes is not None:
+					cached[sourceFile] = classes
+					self._addCounters(sourceFile, { "kept" : len(classes) }, True)
+					self.unitIncludes[sourceFile] = self.cache.includes
+		tasks = []
+		for sourceFile, tuArgs in units:
+			if sourceFile not in cached:
+				# any PCH has to exist before the workers need it
+				pch = self.pch.get(tuArgs) if self.pch is not None else None
+				tasks.append((sourceFile, tuArgs, exclusions, pch))
+		if len(tasks) == 0:
+			for sourceFile, tuArgs in units:
+				self._mergeClasses(cached[sourceFile])
+				yield sourceFile, [ umlClass.fqn for umlClass in cached[sourceFile] ]
 			return
+		# forked workers would inherit, and repeat, anything still buffered
+		dbmsg.flush()
+		with multiprocessing.Pool(min(jobs, len(tasks)), initializer=initWorker, initargs=(self.args,)) as pool:
+			# imap keeps submission order so merging stays deterministic
+			results = pool.imap(extractWorker, tasks)
+			for sourceFile, tuArgs in units:
+				if sourceFile in cached:
+					classes = cached[sourceFile]
+				else:
+					sourceFile, classes, includes, counters = next(results)
+					self._addCounters(sourceFile, counters)
+					self._addIncludes(sourceFile, tuArgs, includes)
+					dbmsg.debug(f"Parsed {sourceFile}")
+					if self.cache is not None and includes is not None:
+						self.cache.store(sourceFile, tuArgs, settings, self._cacheIncludes(tuArgs, includes), classes)
+				self._mergeClasses(classes)
+				yield sourceFile, [ umlClass.fqn for umlClass in classes ]
 
-		# exclude on the basis of a name(space)
-		for ns in excludeNamespaces:
-			if re.search(ns, umlClass.fqn) != None:
-				if  verbosity > 2:
-					dbmsg.debug(f"Skipping namespace: {ns} {umlClass.fqn}")
-				return
+	#--------------------------------------------------------------------------
+	#
+	def _getOutfileName(self, sdirname : str, sbasename : str) -> str:
+		""" expand the macroised outfile setting """
+		dotfileName = self.args[constants.outfile]
+		dotfileName=dotfileName.replace("$SRCDIR",sdirname)
+		dotfileName=dotfileName.replace("$SRCNAME",sbasename)
+		return dotfileName
 
-		# exclude on the basis of a filepath
-		abspath = os.path.abspath(umlClass.filename)
-		# dbmsg.debug(f"{abspath} -> {excludeFilepaths}")
-		for xp in excludeFilepaths:
-			# if re.find(xp, abspath,constants.reOpts):
-			if abspath.find(xp) != -1:
-				if verbosity > 2:
-					dbmsg.debug(f"Skipping include path: {abspath}")
+	#--------------------------------------------------------------------------
+	#
+	def _writeDiagram(self, dotfileName : str, generator : DotGenerator):
+		""" write the diagram(s) for a generator: focused by the query, split if too big """
+		if self.query is not None:
+			generator = generator.query(*self.query)
+			if generator.count() == 0:
+				dbmsg.log(1, "Nothing matches the query for %s", dotfileName)
 				return
+		partitionSize = int(self.args[constants.partitionsize])
+		if partitionSize > 0 and generator.count() > partitionSize:
+			self._writePartitions(dotfileName, generator, partitionSize)
+		else:
+			self._writeDotFile(dotfileName, generator)
 
-		# seen and parsed before? 
-		if self.dotGenerator.hasClass(umlClass.fqn):
-			return
+	#--------------------------------------------------------------------------
+	#
+	def _writePartitions(self, dotfileName : str, generator : DotGenerator, partitionSize : int):
+		""" one DOT file per part, i.e. test.part1.dot, and a test.html index linking the SVGs """
+		stem = dotfileName[:-len(".dot")] if dotfileName.endswith(".dot") else dotfileName
+		parts = generator.partition(self.args[constants.partitionby], partitionSize)
+		dbmsg.debug(f"Splitting {dotfileName} : {generator.count()} class(es) into {len(parts)} part(s)")
+		self.stats.add("partitions", len(parts))
+		rows = []
+		for index, (label, part) in enumerate(parts, 1):
+			partName = f"{stem}.part{index}.dot"
+			# the renderers pick these up as they are written
+			self._writeDotFile(partName, part)
+			svgName = html.escape(os.path.basename(partName) + ".svg")
+			rows.append(f"<li><a href=\"{svgName}\">{html.escape(label)}</a> ({part.count()} class(es))</li>\n")
+		title = html.escape(os.path.basename(stem))
+		with open(f"{stem}.html", "w") as index:
+			index.write(f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{title}</title></head>\n")
+			index.write(f"<body>\n<h1>{title}</h1>\n<p>{generator.count()} class(es) in {len(parts)} part(s)</p>\n<ol>\n")
+			index.writelines(rows)
+			index.write("</ol>\n</body></html>\n")
 
-		# process this class
-		umlClass.Process(cursor)
+	#--------------------------------------------------------------------------
+	#
+	def _renderSettings(self, count : int) -> tuple:
+		""" (compact labels?, layout engine) for a diagram of count classes """
+		profile = self.args[constants.renderprofile]
+		fastNodes = int(self.args[constants.fastnodes])
+		compact = profile == "fast" or (profile == "auto" and fastNodes > 0 and count > fastNodes)
+		layoutNodes = int(self.args[constants.layoutnodes])
+		engine = self.args[constants.layoutengine] if layoutNodes > 0 and count > layoutNodes else "dot"
+		return compact, engine
 
-		# map it.
-		self.dotGenerator.addClass(umlClass)
+	#--------------------------------------------------------------------------
+	#
+	def _streamDot(self, fileName : str, generator : DotGenerator, compact : bool, engine : str) -> DigestWriter:
+		""" write DOT laid out by engine to fileName """
+		# only dot draws namespace clusters
+		namespaces = self.args[constants.generatenamespaces] == "true" and engine == "dot"
+		with open(fileName, 'w') as dotfile:
+			writer = DigestWriter(dotfile)
+			generator.write(writer, namespaces, compact)
+		return writer
 
 	#--------------------------------------------------------------------------
 	#
-	def _traverseAst(self, cursor, excludeNamespaces, excludeFilepaths):
-		""" recursively walk the clang AST """
-		# dbmsg.debug(f"{cursor.kind} -> {cursor.displayname} {cursor.spelling}")
-		# if cursor.kind == clang.cindex.CursorKind.NAMESPACE:
-			# self.debug(f"{cursor.kind} -> {cursor.displayname} {cursor.spelling}")
-			# dbmsg.debug(f"{os.path.abspath(cursor.location.file.name).strip()}:{cursor.location.line} {cursor.kind} -> {cursor.displayname} {cursor.spelling}")
-		""" process if the current cursor is a class, class template or struct declaration """
-		#if cursor.kind == clang.cindex.CursorKind(280):
-		#    pass
+	def _renderKey(self, digest : str, engine : str) -> str:
+		""" what the renderer remembers about an SVG. same DOT, different layout, different SVG """
+		return digest if engine == "dot" else f"{engine}:{digest}"
 
-		# work-around for https://github.com/sighingnow/libclang/issues/25
-		try:
-			if (cursor.kind == clang.cindex.CursorKind.CLASS_DECL
-					or cursor.kind == clang.cindex.CursorKind.STRUCT_DECL
-					or cursor.kind == clang.cindex.CursorKind.CLASS_TEMPLATE):
-				self._processClass(cursor, excludeNamespaces, excludeFilepaths)
-			for child_node in cursor.get_children():
-				self._traverseAst(child_node, excludeNamespaces, excludeFilepaths)
-		except Exception:
-			pass
+	#--------------------------------------------------------------------------
+	#
+	def _writeDotFile(self, dotfileName : str, generator : DotGenerator):
+		""" write a DOT file and queue it for rendering to SVG """
+		compact, engine = self._renderSettings(generator.count())
+		# i.e test.cpp.svg
+		dbmsg.debug(f"Generating dotfile {dotfileName} : {generator.count()} class(es)")
+		# create the folder if required 
+		folder = dirname(dotfileName)
+		if not os.path.exists(folder):
+			os.makedirs(folder)
+		# stream the DOT to a scratch file, hashing as we go
+		scratchName = f"{dotfileName}.tmp"
+		start = time.perf_counter()
+		with self.stats.phase("generate"):
+			writer = self._streamDot(scratchName, generator, compact, engine)
+		digest = writer.hexdigest()
+		self.stats.add("diagrams")
+		self.stats.add("dotBytes", writer.size)
+		self.stats.addDiagram(dotfileName, { "classes" : generator.count(), "dotBytes" : writer.size,
+			"generate" : time.perf_counter() - start, "engine" : engine, "compact" : compact })
+		self.written.append(dotfileName)
+		# rendered this exact DOT before? then we are done. 
+		if os.path.exists(f"{dotfileName}.svg") and Renderer.renderedDigest(dotfileName) == self._renderKey(digest, engine):
+			dbmsg.debug(f"Unchanged {dotfileName}")
+			# the SVG is current, but the DOT may have been deleted since
+			if os.path.exists(dotfileName):
+				os.remove(scratchName)
+			else:
+				os.replace(scratchName, dotfileName)
+			self.unchanged += 1
+			self.stats.addDiagram(dotfileName, { "unchanged" : True })
+			return
+		# do not touch an identical DOT file, i.e. when only the SVG is missing
+		if os.path.exists(dotfileName) and self._fileDigest(dotfileName) == digest:
+			os.remove(scratchName)
+		else:
+			os.replace(scratchName, dotfileName)
+		# too slow to lay out in full? then the simplest we have. runs on a render thread
+		fallback = None
+		if not compact:
+			def fallback():
+				fastEngine = self.args[constants.layoutengine]
+				self._streamDot(dotfileName, generator, True, fastEngine)
+				return fastEngine
+		# generate the SVG
+		self.renderer.submit(dotfileName, self._renderKey(digest, engine), engine, fallback)
 
 	#--------------------------------------------------------------------------
 	#
-	def _parseTranslationUnit(self, filePath : str, clangArgs : list, includeDirs : list, excludeNamespaces : list, excludeFilepaths : list):
-		""" parse a single source file """
-		includeDirs = includeDirs + self.clang_system_include_paths
-		clangArgs += ['-I' + includeDir for includeDir in includeDirs]
-		dbmsg.debug(f"{self.clang_path} {clangArgs} {filePath}")
-		tu = self.index.parse(filePath, args=clangArgs, options=clang.cindex.TranslationUnit.PARSE_SKIP_FUNCTION_BODIES)
-		for diagnostic in tu.diagnostics:
-			dbmsg.debug(f"{diagnostic}")
-		self._traverseAst(tu.cursor, excludeNamespaces, excludeFilepaths)
+	def _fileDigest(self, fileName : str) -> str:
+		""" hash of a text file as we would have written it """
+		sha = hashlib.sha256()
+		with open(fileName, 'r') as f:
+			for line in f:
+				sha.update(line.encode())
+		return sha.hexdigest()
+
+	#--------------------------------------------------------------------------
+	#
+	def _getCompileCommands(self) -> list:
+		""" (source file, clang args) units from compile_commands.json """
+		patterns = [ s.strip() for s in self.args.get(constants.compiledbfilter, "").split(",") ]
+		patterns = [ p for p in patterns if p != "" ]
+		database = CompileDatabase(self.args[constants.compiledb])
+		return database.getCommands(patterns, self.exclusions)
 
 
 	#--------------------------------------------------------------------------
@@ -175,20 +433,65 @@ class Application:
 		# i.e help was requested ...
 		if self.args == {}:
 			return
+		# no C++ at all. just a saved model to render
+		if self.args.get(constants.renderonly):
+			self._renderModel(self.args[constants.renderonly])
+			return
+		#
+		units = self._discoverUnits()
+		# a list, or a generator when the walk and the parse run together
+		if units == []:
+			return
+		self._processUnits(units)
+		self._export()
+		self._finishRun()
+		# stay resident and take requests
+		if self.args.get(constants.serve):
+			Server(self, self.args[constants.serve]).serve()
+		# ... or keep up with edits
+		elif self.args.get(constants.watch):
+			self._watch()
+		#
+		if self.pch is not None:
+			self.pch.cleanup()
 
+	#--------------------------------------------------------------------------
+	#
+	def _discoverUnits(self):
+		""" (source file, complete clang args) for every file to parse. [] if there are none.
+		a generator when they can be parsed one by one as the directory walk finds them """
 		fileTypes = self.args[constants.filetypes].split(",")
 		fileTypes = [ s.strip() for s in fileTypes ]
-		filesToParse = self._getFiles(self.args[constants.directory], fileTypes)
+		jobs = int(self.args[constants.jobs])
+		# nothing has to see the whole list first?
+		lazy = ((jobs == 1 or (jobs <= 0 and os.cpu_count() == 1))
+			and self.args[constants.headermode] == "off" and not self.args.get(constants.compiledb))
+		# the build system knows best: files and flags come from compile_commands.json
+		compileCommands = None
+		if self.args.get(constants.compiledb):
+			with self.stats.phase("discover"):
+				compileCommands = self._getCompileCommands()
+			filesToParse = [ sourceFile for sourceFile, clangArgs in compileCommands ]
+		elif lazy:
+			filesToParse = self._getFiles(self.args[constants.directory])
+			first = next(filesToParse, None)
+			filesToParse = [] if first is None else itertools.chain([ first ], filesToParse)
+		else:
+			with self.stats.phase("discover"):
+				filesToParse = list(self._getFiles(self.args[constants.directory]))
 		#
 		if False:
 			dbmsg.debug(f"Parsing {len(filesToParse)} file(s).")
 		#
-		if len(filesToParse) == 0:
-			dbmsg.debug(f"No files matching {fileTypes} in {self.args[constants.directory]}")
-			return
+		if filesToParse == []:
+			if compileCommands is not None:
+				dbmsg.debug(f"No matching compile commands in {self.args[constants.compiledb]}")
+			else:
+				dbmsg.debug(f"No files matching {fileTypes} in {self.args[constants.directory]}")
+			return []
 	
 		sp = ""
-		for csip in self.clang_system_include_paths:
+		for csip in self.systemIncludePaths.get():
 			sp += f"{ os.path.abspath(csip)} "
 		if len(sp) > 0:
 			dbmsg.debug(f"Using clang system path: {sp}")
@@ -196,45 +499,293 @@ class Application:
 		# CSV string to lists ...
 		includeDirs = self.args[constants.include].split(",")
 		includeDirs = [ s.strip() for s in includeDirs ]
-		excludeNamespace = self.args[constants.excludenamespace].split(",")
-		excludeNamespace = [ s.strip() for s in excludeNamespace ]
-		excludeFilepath = self.args[constants.excludefilepath].split(",")
-		excludeFilepath = [ s.strip() for s in excludeFilepath ]
 		if False:
 			dbmsg.debug(f"-i: {includeDirs}")
-			dbmsg.debug(f"-xn: {excludeNamespace}")
-			dbmsg.debug(f"-xf: {excludeFilepath}")
+			dbmsg.debug(f"-xn: {self.exclusionFilter.namespaces}")
+			dbmsg.debug(f"-xf: {self.exclusionFilter.filepaths}")
 
 		# gak. 
 		clangArgs=['-x','c++']
 		clangArgs += [ f"-std={self.args[constants.clangstandard].strip()}" ]
-		clangDefines = [ f"-D{s.strip()}" for s in self.args[constants.clangdefines].split(',') ]
+		clangDefines = [ f"-D{s.strip()}" for s in self.args[constants.clangdefines].split(',') if s.strip() != "" ]
 		clangArgs += clangDefines
 		#
-		dbmsg.debug(f"Queuing {filesToParse}")
+		# build each distinct argument list once. TUs share the result and nobody modifies it.
+		built = {}
+		def tuArgs(args : list, includeDirs : list) -> list:
+			key = tuple(args)
+			if key not in built:
+				built[key] = self._buildClangArgs(args, includeDirs)
+				dbmsg.debug(f"{self.clang_path} {built[key]}")
+				dbmsg.log(1, "%d clang arg(s)", len(built[key]))
+			return built[key]
+		if compileCommands is not None:
+			# per file flags. the .ini include, define and standard settings do not apply.
+			units = [ (sourceFile, tuArgs(args, [])) for sourceFile, args in compileCommands ]
+		elif lazy:
+			return self._streamUnits(filesToParse, tuArgs(clangArgs, includeDirs))
+		else:
+			units = [ (sourceFile, tuArgs(clangArgs, includeDirs)) for sourceFile in filesToParse ]
 		#
+		dbmsg.debug(f"Queuing {filesToParse}")
+		units = self._selectUnits(units)
+		self.units = units
+		return units
+
+	#--------------------------------------------------------------------------
+	#
+	def _streamUnits(self, filesToParse, tuArgs : list):
+		""" yields (source file, clang args) units as the files are found, keeping self.units up to date """
+		self.units = []
 		for sourceFile in filesToParse:
-			dbmsg.debug(f"Parsing {sourceFile}")
-			self._parseTranslationUnit(sourceFile, clangArgs, includeDirs, excludeNamespace, excludeFilepath)
-			#
-			dotfileName = self.args[constants.outfile]
-			sdirname = os.path.dirname(sourceFile)
-			dotfileName=dotfileName.replace("$SRCDIR",sdirname)
-			sbasename= os.path.basename(sourceFile)
-			dotfileName=dotfileName.replace("$SRCNAME",sbasename)
-			# i.e test.cpp.svg
-			dbmsg.debug(f"Generating dotfile {dotfileName} : {self.dotGenerator.count()} class(es)")
-			# create the folder if required 
-			folder = dirname(dotfileName)
-			if not os.path.exists(folder):
-				os.makedirs(folder)
-			# generate the DOT
-			with open(dotfileName, 'w') as dotfile:
-				dotfile.write(self.dotGenerator.generate(self.args[constants.generatenamespaces]))
-			# generate the SVG
-			ret = os.system(f"dot -Tsvg -O {dotfileName}")
-			#
-			dbmsg.debug(f"Generated {dotfileName}.svg")
+			unit = (sourceFile, tuArgs)
+			self.units.append(unit)
+			yield unit
+
+	#--------------------------------------------------------------------------
+	#
+	def _selectUnits(self, units : list) -> list:
+		""" headermode: parse just enough files to see every project header once, or each header on its own """
+		mode = self.args[constants.headermode]
+		self.coverUnits = None
+		if mode == "off":
+			return units
+		if self.args[constants.outputmode] != constants.outputProject:
+			dbmsg.debug(f"headermode {mode} needs outputmode {constants.outputProject}. Parsing every file")
+			return units
+		graph = IncludeGraph(self.systemIncludePaths.get(), self.exclusionFilter)
+		with self.stats.phase("includes"):
+			selected = graph.cover(units) if mode == "cover" else graph.stubs(units)
+		if mode == "cover":
+			self.coverUnits = (graph, units)
+		dbmsg.debug(f"headermode {mode}: parsing {len(selected)} file(s) for {len(units)} source file(s)")
+		self.stats.add("sourceFiles", len(units))
+		return selected
+
+	#--------------------------------------------------------------------------
+	#
+	def _processUnits(self, units : list, shared : dict = None):
+		""" parse units, map their classes and write the diagrams.
+		shared classes were unmapped by _forgetUnits() but another file still sees them """
+		outputMode = self.args[constants.outputmode]
+		for sourceFile, names in self._parseTranslationUnits(units, self.exclusionFilter):
+			self.unitClasses[sourceFile] = names
+			# a definition still beats a forward declaration
+			if shared is not None:
+				self._mergeClasses(shared.values())
+			if outputMode == constants.outputPerFile:
+				self._writeUnitDiagram(sourceFile, names)
+		if self.coverUnits is not None:
+			self._coverMissed()
+		if outputMode == constants.outputProject:
+			self._writeProjectDiagram(self.args[constants.directory])
+
+	#--------------------------------------------------------------------------
+	#
+	def _coverMissed(self):
+		""" headermode cover chose from a text scan, which counts an #include under #if 0.
+		parse more units until every header a unit might see either has been seen by clang
+		or every unit that might see it has been parsed """
+		graph, units = self.coverUnits
+		extra = 0
+		while True:
+			parsed = set(os.path.abspath(sourceFile) for sourceFile in self.unitIncludes)
+			seen = set(parsed)
+			for includes in self.unitIncludes.values():
+				seen.update(map(os.path.abspath, includes))
+			with self.stats.phase("includes"):
+				missed = graph.cover([ unit for unit in units if os.path.abspath(unit[0]) not in parsed ], seen)
+			if len(missed) == 0:
+				break
+			extra += len(missed)
+			for sourceFile, names in self._parseTranslationUnits(missed, self.exclusionFilter):
+				self.unitClasses[sourceFile] = names
+			self.units = list(self.units) + missed
+		if extra > 0:
+			dbmsg.debug(f"headermode cover: parsed {extra} more file(s) for headers the first choice did not really include")
+
+	#--------------------------------------------------------------------------
+	#
+	def _forgetUnits(self, sourceFiles : list) -> dict:
+		""" unmap every class the source files saw. returns those another file saw too,
+		fqn -> UmlClass, in case they do not turn up again """
+		sourceFiles = set(sourceFiles)
+		elsewhere = set()
+		for sourceFile, names in self.unitClasses.items():
+			if sourceFile not in sourceFiles:
+				elsewhere.update(names)
+		shared = {}
+		for sourceFile in sourceFiles:
+			self.unitIncludes.pop(sourceFile, None)
+			for fqn in self.unitClasses.pop(sourceFile, []):
+				umlClass = self.dotGenerator.classes.pop(fqn, None)
+				if umlClass is not None and fqn in elsewhere:
+					shared[fqn] = umlClass
+		return shared
+
+	#--------------------------------------------------------------------------
+	#
+	def update(self, sourceFiles : list) -> list:
+		""" reparse the named source files, replacing whatever classes they saw before,
+		and rewrite their diagrams. no files == everything. returns the DOT files written """
+		# a fresh report per request
+		self.stats = Stats()
+		self.unchanged = 0
+		self.written = []
+		self.renderer = Renderer(int(self.args[constants.renderjobs]), float(self.args[constants.rendertimeout]))
+		# the files may have changed since we last decided about their classes
+		self.extractor.decisions = {}
+		if self.cache is not None:
+			self.cache.refresh()
+		if len(sourceFiles) == 0:
+			units = self._discoverUnits()
+			forget = list(self.unitClasses)
+		else:
+			known = { os.path.abspath(sourceFile) : (sourceFile, tuArgs) for sourceFile, tuArgs in self.units }
+			wanted = [ os.path.abspath(sourceFile) for sourceFile in sourceFiles ]
+			# new or deleted files?
+			if any(sourceFile not in known or not os.path.exists(sourceFile) for sourceFile in wanted):
+				known = { os.path.abspath(sourceFile) : (sourceFile, tuArgs) for sourceFile, tuArgs in self._discoverUnits() }
+			units = [ known[sourceFile] for sourceFile in wanted if sourceFile in known and os.path.exists(sourceFile) ]
+			forget = [ sourceFile for sourceFile, tuArgs in units ]
+			for sourceFile in wanted:
+				if sourceFile not in known or not os.path.exists(sourceFile):
+					dbmsg.debug(f"Not a source file we parse: {sourceFile}")
+					# i.e. deleted. whatever it saw goes.
+					forget += [ name for name in self.unitClasses if os.path.abspath(name) == sourceFile ]
+		shared = self._forgetUnits(forget)
+		self._processUnits(units, shared)
+		self._export()
+		self._finishRun()
+		return self.written
+
+	#--------------------------------------------------------------------------
+	#
+	def _watchedFiles(self) -> tuple:
+		""" (files, directories) to watch: every source file and the project headers it pulled in,
+		plus the folders new source files could turn up in """
+		system = tuple(os.path.join(os.path.abspath(path), "") for path in self.systemIncludePaths.get())
+		files = set(os.path.abspath(sourceFile) for sourceFile, tuArgs in self.units)
+		for includes in self.unitIncludes.values():
+			files.update(path for path in map(os.path.abspath, includes) if not path.startswith(system))
+		directories = set(os.path.dirname(path) for path in files)
+		directories.add(os.path.abspath(self.args[constants.directory]))
+		return files, directories
+
+	#--------------------------------------------------------------------------
+	#
+	def _affectedUnits(self, changed : set) -> list:
+		""" the source files to reparse after changes to these paths """
+		# file -> source files that pulled it in
+		users = {}
+		for sourceFile, tuArgs in self.units:
+			users.setdefault(os.path.abspath(sourceFile), []).append(sourceFile)
+		for sourceFile, includes in self.unitIncludes.items():
+			for path in includes:
+				users.setdefault(os.path.abspath(path), []).append(sourceFile)
+		affected = {}
+		for path in sorted(changed):
+			if path in users:
+				for sourceFile in users[path]:
+					affected[sourceFile] = True
+			# a new source file?
+			elif self.fileFinder.isWanted(path):
+				affected[path] = True
+		return list(affected)
+
+	#--------------------------------------------------------------------------
+	#
+	def _watch(self):
+		""" reparse whatever a change affects and refresh its diagrams, until interrupted """
+		watcher = createWatcher(self.args[constants.watchmethod])
+		delay = float(self.args[constants.watchdelay])
+		dbmsg.debug(f"Watching {self.args[constants.directory]} ({watcher.name}). Ctrl-C to stop")
+		dbmsg.flush()
+		try:
+			while True:
+				watcher.setFiles(*self._watchedFiles())
+				changed = watcher.wait()
+				# editors write, rename and touch in bursts. wait for things to settle.
+				while True:
+					more = watcher.wait(delay)
+					if len(more) == 0:
+						break
+					changed |= more
+				sourceFiles = self._affectedUnits(changed)
+				if len(sourceFiles) == 0:
+					continue
+				start = time.perf_counter()
+				written = self.update(sourceFiles)
+				dbmsg.debug(f"Reparsed {len(sourceFiles)} file(s), wrote {len(written)} diagram(s) in {time.perf_counter() - start:.2f}s")
+				dbmsg.flush()
+		except KeyboardInterrupt:
+			pass
+		finally:
+			watcher.close()
+
+	#--------------------------------------------------------------------------
+	#
+	def _export(self):
+		""" save the model if asked to """
+		if not self.args.get(constants.export):
+			return
+		with self.stats.phase("export"):
+			ModelFile(self.args[constants.export]).write(self.args[constants.directory], self.dotGenerator.sortedClasses(), list(self.unitClasses.items()))
+		dbmsg.debug(f"Exported {self.dotGenerator.count()} class(es) to {self.args[constants.export]}")
+
+	#--------------------------------------------------------------------------
+	#
+	def _writeUnitDiagram(self, sourceFile : str, names : list):
+		""" per-file output: just what this TU can see """
+		dotfileName = self._getOutfileName(os.path.dirname(sourceFile), os.path.basename(sourceFile))
+		self._writeDiagram(dotfileName, self.dotGenerator.subset(names))
+
+	#--------------------------------------------------------------------------
+	#
+	def _writeProjectDiagram(self, root : str):
+		""" project output: everything, once """
+		dotfileName = self._getOutfileName(root, os.path.basename(root))
+		self._writeDiagram(dotfileName, self.dotGenerator)
+
+	#--------------------------------------------------------------------------
+	#
+	def _renderModel(self, fileName : str):
+		""" generate and render the diagrams for a model saved by --export """
+		with self.stats.phase("load"):
+			root, classes, units = ModelFile(fileName).read()
+		dbmsg.debug(f"Loaded {len(classes)} class(es) and {len(units)} file(s) from {fileName}")
+		for umlClass in classes:
+			self.dotGenerator.addClass(umlClass)
+		if self.args[constants.outputmode] == constants.outputPerFile:
+			for sourceFile, names in units:
+				self._writeUnitDiagram(sourceFile, names)
+		else:
+			self._writeProjectDiagram(root)
+		self._finishRun()
+
+	#--------------------------------------------------------------------------
+	#
+	def _finishRun(self):
+		""" wait for the renderers and report """
+		# whatever is left to render once parsing is over
+		with self.stats.phase("renderWait"):
+			results = self.renderer.finish()
+		for dotfileName, (ok, seconds, message) in results.items():
+			self.stats.add("rendered" if ok else "renderFailed")
+			self.stats.add("renderWall", seconds)
+			self.stats.addDiagram(dotfileName, { "rendered" : ok, "render" : seconds, "message" : message })
+		self.stats.add("renderFallbacks", self.renderer.fallbacks)
+		self.stats.add("unchanged", self.unchanged)
+		dbmsg.debug(f"{self.renderer.summary()}. {self.unchanged} unchanged diagram(s) skipped")
+		if self.stats.get("visited") > 0:
+			dbmsg.debug(f"Visited {self.stats.get('visited')} cursor(s), skipped {self.stats.get('skipped')} excluded subtree(s), {self.stats.get('failed')} failed node(s)")
+		if self.cache is not None:
+			dbmsg.debug(self.cache.summary())
+		dbmsg.log(1, "%s", self.stats.summary())
+		if self.args.get(constants.stats):
+			self.stats.write(self.args[constants.stats])
+			dbmsg.debug(f"Wrote {self.args[constants.stats]}")
+		dbmsg.flush()
 
 	#--------------------------------------------------------------------------
 	#
@@ -246,6 +797,21 @@ class Application:
 		-h  get help!
 		-i specify which `path/to/project.ini` if required. overrides search in current directory
 		-s overrides the `directory` setting in the `.ini` file
+		-j number of parallel parsing processes. overrides `jobs` in the `.ini` file. 0 == all CPUs
+		-c path/to/cache directory for extracted classes. overrides `cachedir` in the `.ini` file
+		-p path/to/build directory containing compile_commands.json. overrides `compiledb` in the `.ini` file
+		-m per-file|project. one diagram per source file or one for everything. overrides `outputmode` in the `.ini` file
+		--log path/to/file. write messages as JSON lines. overrides `logfile` in the `.ini` file
+		--stats path/to/file.json. write per phase timings and counters. overrides `stats` in the `.ini` file
+		--export path/to/model.jsonl|model.bin. save the extracted classes. overrides `export` in the `.ini` file
+		--render-only path/to/model. generate diagrams from a saved model. no C++ is parsed
+		--root regex. only classes matching regex and their neighbourhood. overrides `queryroot` in the `.ini` file
+		--hops k. how far from the root classes to go. overrides `queryhops` in the `.ini` file
+		--direction both|ancestors|descendants. overrides `querydirection` in the `.ini` file
+		--max-nodes n. keep the n classes nearest the roots. overrides `querymaxnodes` in the `.ini` file
+		serve [--socket path]. parse everything, then stay resident and take requests on a Unix socket. default {constants.socketname}
+		client [--socket path] [--status|--stop] [file ...]. ask a server to reparse files (none == all) and rewrite their diagrams
+		--watch. parse everything, then reparse whatever a change to a source file or header affects. Ctrl-C to stop
 
 		default is {iniName}
 		"""
@@ -289,6 +855,23 @@ class Application:
 		#
 		source_directory = None
 		init_root = None
+		jobs = None
+		cachedir = None
+		compiledb = None
+		outputmode = None
+		logfile = None
+		statsfile = None
+		export = None
+		renderonly = None
+		serve = None
+		watch = None
+		socketPath = constants.socketname
+		# switch -> ini key for the subgraph query
+		queryArgs = { "--root" : constants.queryroot, "--hops" : constants.queryhops,
+			"--direction" : constants.querydirection, "--max-nodes" : constants.querymaxnodes }
+		query = {}
+		# switches taking a value. that value is never a command word
+		valueSwitches = { "-s", "-i", "-j", "-c", "-p", "-m", "--log", "--stats", "--export", "--render-only", "--socket" } | set(queryArgs)
 		#
 		index = 1
 		while index <= count:
@@ -299,6 +882,41 @@ class Application:
 			# path/to/ini
 			if switch == "-i":
 				iniName = argv[index+1]
+			# parallel parsing
+			if switch == "-j":
+				jobs = argv[index+1]
+			# extraction cache
+			if switch == "-c":
+				cachedir = argv[index+1]
+			# compilation database
+			if switch == "-p":
+				compiledb = argv[index+1]
+			# diagram per file or per project
+			if switch == "-m":
+				outputmode = argv[index+1]
+			# JSON lines log
+			if switch == "--log":
+				logfile = argv[index+1]
+			# timings and counters report
+			if switch == "--stats":
+				statsfile = argv[index+1]
+			# save the model
+			if switch == "--export":
+				export = argv[index+1]
+			# ... or render one
+			if switch == "--render-only":
+				renderonly = argv[index+1]
+			# stay resident
+			if switch == "serve" and argv[index-1] not in valueSwitches:
+				serve = True
+			if switch == "--socket":
+				socketPath = argv[index+1]
+			# keep up with edits
+			if switch == "--watch":
+				watch = True
+			# focus on part of the graph
+			if switch in queryArgs:
+				query[queryArgs[switch]] = argv[index+1]
 			# initialize a top-level directory
 			if switch == "--init":
 				init_root = os.path.basename(os.getcwd())
@@ -322,12 +940,89 @@ class Application:
 		#
 		if source_directory:
 			args[constants.directory]=source_directory
+		if jobs:
+			args[constants.jobs]=jobs
+		if cachedir:
+			args[constants.cachedir]=cachedir
+		if compiledb:
+			args[constants.compiledb]=compiledb
+		if outputmode:
+			args[constants.outputmode]=outputmode
+		if logfile:
+			args[constants.logfile]=logfile
+		if statsfile:
+			args[constants.stats]=statsfile
+		if export:
+			args[constants.export]=export
+		if renderonly:
+			args[constants.renderonly]=renderonly
+			if not os.path.exists(renderonly):
+				raise Exception(f"No model {renderonly}")
+		if serve:
+			args[constants.serve]=os.path.abspath(socketPath)
+		if watch:
+			args[constants.watch]="true"
+		if not args.get(constants.watchmethod):
+			args[constants.watchmethod]="auto"
+		if args[constants.watchmethod] not in ("auto", "inotify", "polling"):
+			raise Exception(f"{iniName} Unknown watchmethod {args[constants.watchmethod]}")
+		if not args.get(constants.watchdelay):
+			args[constants.watchdelay]="0.2"
+		if not args.get(constants.headermode):
+			args[constants.headermode]="off"
+		# an empty prunedirs prunes nothing
+		if constants.prunedirs not in args:
+			args[constants.prunedirs]=".git,.svn,.hg,build,uml"
+		if not args.get(constants.ignorefiles):
+			args[constants.ignorefiles]="true"
+		if args[constants.headermode] not in ("off", "cover", "stubs"):
+			raise Exception(f"{iniName} Unknown headermode {args[constants.headermode]}")
+		args.update(query)
+		if not args.get(constants.queryhops):
+			args[constants.queryhops]="-1"
+		if not args.get(constants.querydirection):
+			args[constants.querydirection]="both"
+		if args[constants.querydirection] not in ("both", "ancestors", "descendants"):
+			raise Exception(f"{iniName} Unknown querydirection {args[constants.querydirection]}")
+		if not args.get(constants.querymaxnodes):
+			args[constants.querymaxnodes]="0"
+		if not args.get(constants.renderjobs):
+			args[constants.renderjobs]="1"
+		if not args.get(constants.rendertimeout):
+			args[constants.rendertimeout]="0"
+		if not args.get(constants.partitionsize):
+			args[constants.partitionsize]="0"
+		if not args.get(constants.partitionby):
+			args[constants.partitionby]="components"
+		if args[constants.partitionby] not in ("components", "namespaces"):
+			raise Exception(f"{iniName} Unknown partitionby {args[constants.partitionby]}")
+		if not args.get(constants.renderprofile):
+			args[constants.renderprofile]="auto"
+		if args[constants.renderprofile] not in ("full", "fast", "auto"):
+			raise Exception(f"{iniName} Unknown renderprofile {args[constants.renderprofile]}")
+		if not args.get(constants.fastnodes):
+			args[constants.fastnodes]="2000"
+		if not args.get(constants.layoutnodes):
+			args[constants.layoutnodes]="5000"
+		if not args.get(constants.layoutengine):
+			args[constants.layoutengine]="sfdp"
+		if not args.get(constants.outputmode):
+			args[constants.outputmode]=constants.outputPerFile
+		if args[constants.outputmode] not in (constants.outputPerFile, constants.outputProject):
+			raise Exception(f"{iniName} Unknown outputmode {args[constants.outputmode]}")
+		# default to serial parsing
+		if not args.get(constants.jobs):
+			args[constants.jobs]="1"
 		#
 		if int(args[constants.verbosity]) >= 4:
 			for k,v in args.items():
 				print (f"{iniName} {k} -> {v}")
 		#
 		args[constants.directory] = os.path.abspath(args[constants.directory])
+		if renderonly:
+			# neither sources nor libclang are needed
+			self.iniName = iniName
+			return args
 		if not os.path.exists(args[constants.directory]):
 			raise Exception(f"{iniName} No directory {args[constants.directory]}")
 		if not os.path.exists(args[constants.libclangpath]):
@@ -5,22 +5,105 @@
 #   All rights reserved.
 #   See LICENCE.md for full details
 #
-#   Credit for originally showcasing Python inspect usage: 
+#   Credit for originally showcasing Python inspect usage:
 #   https://stackoverflow.com/questions/6810999/how-to-determine-file-function-and-line-number
-# 
+#
 
+import os
 import sys
-import inspect
+import json
+import time
+import atexit
+import threading
 
 #--------------------------------------------------------------------------
-# 
+#
 class dbmsg:
+	""" debug output with file/function/line information.
+
+	log(level, ...) drops anything above the configured verbosity before
+	formatting it or looking at the caller's frame, so it is cheap to leave in
+	hot paths. Output is buffered, and can go to a file as JSON lines instead
+	of the console. """
+
+	# messages above this level are dropped
+	verbosity = 1
+	# JSON lines go here when set
+	logFile = None
+	# formatted lines waiting to be written
+	pending = []
+	# lines held before writing. 1 == unbuffered
+	bufferSize = 1 if sys.stdout.isatty() else 64
+	lock = threading.Lock()
+
+	#--------------------------------------------------------------------------
+	def configure(verbosity : int, logFileName : str = None, bufferSize : int = None) -> None:
+		""" set the level and the destination. safe to call more than once """
+		dbmsg.flush()
+		dbmsg.verbosity = verbosity
+		if dbmsg.logFile is not None:
+			dbmsg.logFile.close()
+			dbmsg.logFile = None
+		if logFileName:
+			# appended to, as every worker process writes to the same file
+			dbmsg.logFile = open(logFileName, "ab", buffering=0)
+			dbmsg.bufferSize = 256
+		if bufferSize is not None:
+			dbmsg.bufferSize = max(1, bufferSize)
+
+	#--------------------------------------------------------------------------
+	def enabled(level : int) -> bool:
+		""" would a message at this level be written? """
+		return level <= dbmsg.verbosity
+
+	#--------------------------------------------------------------------------
+	def log(level : int, message : str, *args) -> None:
+		""" write message % args if level is enabled. args are only formatted then """
+		if level > dbmsg.verbosity:
+			return
+		if args:
+			message = message % args
+		dbmsg._emit(level, message, sys._getframe(1))
+
+	#--------------------------------------------------------------------------
 	def debug(message : str) -> None:
-		""" print a debug message with file/function/line information """
-		callerframerecord = inspect.stack()[1]
-		frame = callerframerecord[0]
-		info = inspect.getframeinfo(frame)
-		# in a VS Code terminal, this will generate a clickable link
-		# to enable jumping directly to the source location
-		print(f"{info.filename}:{info.lineno} {message}")
+		""" always print a debug message with file/function/line information """
+		dbmsg._emit(0, message, sys._getframe(1))
+
+	#--------------------------------------------------------------------------
+	def _emit(level : int, message : str, frame) -> None:
+		""" format and queue one message from frame """
+		code = frame.f_code
+		if dbmsg.logFile is not None:
+			line = json.dumps({ "time" : time.time(), "pid" : os.getpid(), "level" : level,
+				"file" : code.co_filename, "line" : frame.f_lineno, "function" : code.co_name, "message" : message })
+		else:
+			# in a VS Code terminal, this will generate a clickable link
+			# to enable jumping directly to the source location
+			line = f"{code.co_filename}:{frame.f_lineno} {message}"
+		with dbmsg.lock:
+			dbmsg.pending.append(line)
+			if len(dbmsg.pending) >= dbmsg.bufferSize:
+				dbmsg._write()
+
+	#--------------------------------------------------------------------------
+	def _write() -> None:
+		""" write out pending lines. caller holds the lock """
+		if len(dbmsg.pending) == 0:
+			return
+		text = "\n".join(dbmsg.pending) + "\n"
+		dbmsg.pending = []
+		if dbmsg.logFile is not None:
+			# one unbuffered append per batch so lines from several processes do not interleave
+			dbmsg.logFile.write(text.encode())
+		else:
+			sys.stdout.write(text)
+			sys.stdout.flush()
+
+	#--------------------------------------------------------------------------
+	def flush() -> None:
+		""" write out anything buffered """
+		with dbmsg.lock:
+			dbmsg._write()
 
+atexit.register(dbmsg.flush)
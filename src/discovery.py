@@ -0,0 +1,212 @@
+#
+#	BSD 3-Clause License
+#
+#   Copyright (c) 2022, Jerry Evans
+#   All rights reserved.
+#   See LICENCE.md for full details
+#
+
+import os
+import re
+import fnmatch
+from .stack import Stack
+
+#------------------------------------------------------------------------------
+class NamePatterns:
+	""" File or directory names, plain or fnmatch globs, tested with `in`.
+	Plain names are a set lookup. All the globs are one compiled expression. """
+
+	globChars = re.compile(r'[*?\[]')
+
+	#--------------------------------------------------------------------------
+	def __init__(self, patterns : list):
+		""" constructor. empty entries are ignored """
+		patterns = [ p for p in patterns if p != "" ]
+		self.names = set(p for p in patterns if self.globChars.search(p) is None)
+		globs = [ p for p in patterns if self.globChars.search(p) is not None ]
+		self.globRe = re.compile("|".join(fnmatch.translate(g) for g in globs)) if len(globs) > 0 else None
+
+	#--------------------------------------------------------------------------
+	def __contains__(self, name : str) -> bool:
+		return name in self.names or (self.globRe is not None and self.globRe.match(name) is not None)
+
+#------------------------------------------------------------------------------
+class IgnoreRules:
+	""" The .gitignore rules in force in one directory: its parent's plus its own.
+
+	Supported: blank lines and # comments, ! negation, a trailing / for
+	directories only, patterns anchored by a leading or inner /, and * ? [...] **.
+	The last matching rule wins. """
+
+	#--------------------------------------------------------------------------
+	def __init__(self, parent : "IgnoreRules" = None):
+		""" constructor """
+		# (base directory, compiled pattern, negated?, directories only?).
+		# base is None for a plain name, which is matched against the entry name alone.
+		self.rules = list(parent.rules) if parent is not None else []
+		# every pattern that ignores, in one expression per base. nothing matching
+		# these, the usual case, means not ignored without trying each rule.
+		self.expressions = dict((base, list(e)) for base, e in parent.expressions.items()) if parent is not None else {}
+		self.quick = list(parent.quick) if parent is not None else []
+
+	#--------------------------------------------------------------------------
+	def _translate(self, pattern : str) -> str:
+		""" gitignore glob -> regular expression over a / separated relative path """
+		out = []
+		i = 0
+		while i < len(pattern):
+			if pattern.startswith("**/", i):
+				out.append("(?:.*/)?")
+				i += 3
+			elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+				out.append("/.*")
+				i += 3
+			elif pattern[i] == "*":
+				out.append("[^/]*")
+				i += 1
+			elif pattern[i] == "?":
+				out.append("[^/]")
+				i += 1
+			elif pattern[i] == "[":
+				# a ] straight after [ or [! is part of the set
+				start = i + 2 if pattern.startswith("[!", i) else i + 1
+				end = pattern.find("]", start + 1 if pattern.startswith("]", start) else start)
+				if end < 0:
+					out.append(re.escape(pattern[i]))
+					i += 1
+				else:
+					chars = pattern[i + 1:end].replace("\\", "\\\\")
+					if chars.startswith("!"):
+						chars = "^" + chars[1:]
+					out.append("[" + chars + "]")
+					i = end + 1
+			else:
+				out.append(re.escape(pattern[i]))
+				i += 1
+		return "".join(out)
+
+	#--------------------------------------------------------------------------
+	def read(self, directory : str) -> bool:
+		""" add the rules from directory/.gitignore, if there is one. returns True if so """
+		try:
+			with open(os.path.join(directory, ".gitignore"), "r", errors="replace") as f:
+				lines = f.read().splitlines()
+		except OSError:
+			return False
+		added = False
+		for line in lines:
+			line = line.rstrip()
+			if line == "" or line.startswith("#"):
+				continue
+			negated = line.startswith("!")
+			if negated:
+				line = line[1:]
+			directoryOnly = line.endswith("/")
+			line = line.rstrip("/")
+			if line == "":
+				continue
+			# no slash == a name at any depth
+			base = None if "/" not in line else directory
+			expression = self._translate(line.lstrip("/")) + r"\Z"
+			self.rules.append((base, re.compile(expression), negated, directoryOnly))
+			if not negated:
+				self.expressions.setdefault(base, []).append(expression)
+				added = True
+		if added:
+			self.quick = [ (base, re.compile("|".join(f"(?:{e})" for e in expressions)))
+				for base, expressions in self.expressions.items() ]
+		return True
+
+	#--------------------------------------------------------------------------
+	def prefixes(self, directory : str) -> dict:
+		""" rule base -> the path from it to directory, ready to have an entry
+		name appended. worked out once per directory, not per rule per entry """
+		prefixes = { None : "" }
+		for base, rule, negated, directoryOnly in self.rules:
+			if base not in prefixes:
+				relative = os.path.relpath(directory, base).replace(os.sep, "/")
+				prefixes[base] = "" if relative == "." else relative + "/"
+		return prefixes
+
+	#--------------------------------------------------------------------------
+	def ignores(self, name : str, isDirectory : bool, prefixes : dict) -> bool:
+		""" is this entry ignored? prefixes come from prefixes() for its directory """
+		for base, quick in self.quick:
+			if quick.match(prefixes[base] + name) is not None:
+				break
+		else:
+			return False
+		ignored = False
+		for base, rule, negated, directoryOnly in self.rules:
+			if directoryOnly and not isDirectory:
+				continue
+			if rule.match(prefixes[base] + name) is not None:
+				ignored = not negated
+		return ignored
+
+#------------------------------------------------------------------------------
+class FileFinder:
+	""" Source file discovery: os.scandir, one compiled pattern for the file
+	types, excluded names as a set or globs, pruned directories (by name, or
+	by .gitignore rules). Files are yielded as they are found, in name order
+	within each directory, directories depth first. """
+
+	#--------------------------------------------------------------------------
+	def __init__(self, fileTypes : list, exclusions : list, pruneDirs : list, useIgnoreFiles : bool, recursive : bool):
+		""" constructor. fileTypes, exclusions and pruneDirs are names or globs """
+		self.fileTypes = NamePatterns(fileTypes)
+		self.exclusions = NamePatterns(exclusions)
+		self.pruneDirs = NamePatterns(pruneDirs)
+		self.useIgnoreFiles = useIgnoreFiles
+		self.recursive = recursive
+		# what the last walk cost
+		self.directories = 0
+		self.pruned = 0
+
+	#--------------------------------------------------------------------------
+	def isWanted(self, fileName : str) -> bool:
+		""" would a file with this name be parsed? """
+		name = os.path.basename(fileName)
+		return name in self.fileTypes and name not in self.exclusions
+
+	#--------------------------------------------------------------------------
+	def find(self, rootDir : str):
+		""" yield the wanted files under rootDir """
+		self.directories = 0
+		self.pruned = 0
+		stack = Stack()
+		stack.push((rootDir, IgnoreRules() if self.useIgnoreFiles else None))
+		while not stack.is_empty():
+			directory, parentRules = stack.pop()
+			self.directories += 1
+			rules = parentRules
+			if rules is not None:
+				ownRules = IgnoreRules(parentRules)
+				if ownRules.read(directory):
+					rules = ownRules
+			try:
+				with os.scandir(directory) as it:
+					entries = sorted(it, key=lambda entry: entry.name)
+			except OSError:
+				continue
+			prefixes = rules.prefixes(directory) if rules is not None else None
+			subdirs = []
+			for entry in entries:
+				try:
+					isDirectory = entry.is_dir(follow_symlinks=False)
+					if isDirectory:
+						if not self.recursive:
+							continue
+						if entry.name in self.pruneDirs or (rules is not None and rules.ignores(entry.name, True, prefixes)):
+							self.pruned += 1
+							continue
+						subdirs.append(entry.path)
+					elif entry.name in self.fileTypes and entry.name not in self.exclusions and entry.is_file():
+						if rules is not None and rules.ignores(entry.name, False, prefixes):
+							continue
+						yield entry.path
+				except OSError:
+					continue
+			# reversed so they pop off in name order
+			for subdir in reversed(subdirs):
+				stack.push((subdir, rules))
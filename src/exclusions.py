@@ -0,0 +1,74 @@
+#
+#	BSD 3-Clause License
+#
+#   Copyright (c) 2022, Jerry Evans
+#   All rights reserved.
+#   See LICENCE.md for full details
+#
+
+import re
+import os
+
+#------------------------------------------------------------------------------
+class ExclusionFilter:
+	""" The excludenamespace and excludefilepath settings, compiled once.
+
+	A name(space) is excluded if any of the namespace patterns re.search()es it.
+	Each pattern is compiled on its own, so inline flags and backreferences
+	mean what they always did. A whole namespace is pruned only by a pattern
+	that cannot look past the end of what it matched: then a match in a::b is
+	still a match in a::b::C, whatever C is.
+	A file is excluded if any of the file path entries is a substring of its
+	absolute path. Empty entries are ignored. Decisions are remembered per
+	namespace and per file name, as the same few turn up again and again. """
+
+	#--------------------------------------------------------------------------
+	def __init__(self, namespaces : list, filepaths : list):
+		""" constructor. namespaces are regular expressions, filepaths plain strings """
+		self.namespaces = [ ns for ns in namespaces if ns != "" ]
+		self.filepaths = [ xp for xp in filepaths if xp != "" ]
+		self.namespaceRes = [ (ns, re.compile(ns)) for ns in self.namespaces ]
+		# no $, \Z, \b, \B or lookaround. a literal \$ is turned away too, which only costs a prune
+		lookAhead = re.compile(r'\$|\\[ZbB]|\(\?[=!<]')
+		self.pruningRes = [ namespaceRe for ns, namespaceRe in self.namespaceRes if lookAhead.search(ns) is None ]
+		# plain substrings, so one alternation. None == nothing is excluded
+		self.filepathRe = None
+		if len(self.filepaths) > 0:
+			self.filepathRe = re.compile("|".join(re.escape(xp) for xp in self.filepaths))
+		# namespace -> excluded?
+		self.namespaceDecisions = {}
+		# file name as given -> excluded?
+		self.fileDecisions = {}
+
+	#--------------------------------------------------------------------------
+	def key(self) -> tuple:
+		""" identifies the settings, i.e. for caching what they decided """
+		return (tuple(self.namespaces), tuple(self.filepaths))
+
+	#--------------------------------------------------------------------------
+	def matchName(self, name : str) -> str:
+		""" the first pattern that excludes a (qualified) class name, None if it is wanted """
+		for ns, namespaceRe in self.namespaceRes:
+			if namespaceRe.search(name) is not None:
+				return ns
+		return None
+
+	#--------------------------------------------------------------------------
+	def isExcludedNamespace(self, namespace : str) -> bool:
+		""" would every class in this namespace be excluded? only a pattern that matches
+		without looking past the namespace says so. detail$ matches a::detail but
+		not a::detail::Impl, std::(?!string) matches std:: but not std::string """
+		excluded = self.namespaceDecisions.get(namespace)
+		if excluded is None:
+			excluded = any(namespaceRe.search(namespace) is not None for namespaceRe in self.pruningRes)
+			self.namespaceDecisions[namespace] = excluded
+		return excluded
+
+	#--------------------------------------------------------------------------
+	def isExcludedFile(self, fileName : str) -> bool:
+		""" is anything declared in this file excluded? """
+		excluded = self.fileDecisions.get(fileName)
+		if excluded is None:
+			excluded = self.filepathRe is not None and self.filepathRe.search(os.path.abspath(fileName)) is not None
+			self.fileDecisions[fileName] = excluded
+		return excluded
@@ -0,0 +1,262 @@
+#
+#	BSD 3-Clause License
+#
+#   Copyright (c) 2022, Jerry Evans
+#   All rights reserved.
+#   See LICENCE.md for full details
+#
+#
+# Credit for originally showcasing Python/libclang usage:
+#   https://github.com/gklingler/CodeDependencyVisualizer
+#
+
+import time
+import clang.cindex
+from clang.cindex import Index, Config
+from .constants import constants
+from .model import UmlClass
+from .stack import Stack
+from .exclusions import ExclusionFilter
+from .dbmsg import dbmsg
+
+#------------------------------------------------------------------------------
+class Extractor:
+	""" Parse translation units and extract UmlClass records """
+
+	# USR decision for classes that are never wanted: unnamed, anonymous or excluded
+	unwanted = object()
+
+	#--------------------------------------------------------------------------
+	def __init__(self, args : dict):
+		""" constructor. args are the (merged) .ini settings """
+		self.args = args
+		# created on first use. one per process.
+		self.index = None
+		# fully qualified classname -> UmlClass for the current TU
+		self.classes = {}
+		# classes mapped elsewhere. we skip these.
+		self.known = {}
+		# fully qualified names of every wanted class in the last TU, new or known
+		self.names = {}
+		# clang USR -> processed UmlClass, or unwanted. kept across TUs, one map
+		# per (clang args, exclusions) as either can change the outcome
+		self.decisions = {}
+		self.decided = {}
+		# headers pulled in by the last TU. None if it failed fatally.
+		self.includes = None
+		# counts and timings for the last TU. see _newCounters()
+		self.counters = self._newCounters()
+
+	#--------------------------------------------------------------------------
+	def _newCounters(self) -> dict:
+		""" per TU counts. skipped == pruned subtrees, failed == bad nodes, kept/excluded == classes.
+		*Wall/*Cpu are seconds in clang's parse, the AST walk and UmlClass.Process, which is part of the walk """
+		return { "visited" : 0, "skipped" : 0, "failed" : 0, "kept" : 0, "excluded" : 0, "reused" : 0, "diagnostics" : 0,
+			"parseWall" : 0.0, "parseCpu" : 0.0, "traverseWall" : 0.0, "traverseCpu" : 0.0, "processWall" : 0.0, "processCpu" : 0.0 }
+
+	#--------------------------------------------------------------------------
+	def _addTime(self, name : str, wall : float, cpu : float) -> None:
+		""" accumulate the time since (wall, cpu) under name """
+		self.counters[name + "Wall"] += time.perf_counter() - wall
+		self.counters[name + "Cpu"] += time.process_time() - cpu
+
+	#--------------------------------------------------------------------------
+	def getIndex(self) -> Index:
+		""" create the clang index on demand """
+		if self.index is None:
+			self.index = clang.cindex.Index.create()
+		return self.index
+
+	#--------------------------------------------------------------------------
+	def _supersedes(self, fqn : str, isDefinition : bool) -> bool:
+		""" would a class with this name replace what we have for it, known or in this TU?
+		first seen wins, except that a definition replaces a forward declaration """
+		for classes in (self.known, self.classes):
+			current = classes.get(fqn)
+			if current is not None and (current.isDefinition or not isDefinition):
+				return False
+		return True
+
+	#--------------------------------------------------------------------------
+	def _processClass(self, cursor, exclusions : ExclusionFilter):
+		""" Processes an ast node that is a class. """
+		# the same class turns up in TU after TU. if we have decided about it
+		# before, do not go near the (ctypes heavy) UmlClass constructor.
+		usr = cursor.get_usr()
+		isDefinition = cursor.is_definition()
+		decided = self.decided.get(usr) if usr else None
+		if decided is self.unwanted:
+			self.counters["excluded"] += 1
+			return
+		if decided is not None and (decided.isDefinition or not isDefinition):
+			self.counters["reused"] += 1
+			self.names[decided.fqn] = True
+			if self._supersedes(decided.fqn, decided.isDefinition):
+				self.classes[decided.fqn] = decided
+			return
+
+		#
+		umlClass = UmlClass(cursor)
+
+		# JME should be an option.
+		if umlClass.isUnamed() or umlClass.isAnonymous():
+			self.counters["excluded"] += 1
+			if usr:
+				self.decided[usr] = self.unwanted
+			return
+
+		# exclude on the basis of a name(space)
+		ns = exclusions.matchName(umlClass.fqn)
+		if ns is not None:
+			dbmsg.log(3, "Skipping namespace: %s %s", ns, umlClass.fqn)
+			self.counters["excluded"] += 1
+			if usr:
+				self.decided[usr] = self.unwanted
+			return
+
+		# exclude on the basis of a filepath
+		if exclusions.isExcludedFile(umlClass.filename):
+			dbmsg.log(3, "Skipping include path: %s", umlClass.filename)
+			self.counters["excluded"] += 1
+			if usr:
+				self.decided[usr] = self.unwanted
+			return
+
+		# seen and parsed before? a known definition is as good as one we build.
+		self.names[umlClass.fqn] = True
+		if not self._supersedes(umlClass.fqn, umlClass.isDefinition):
+			known = self.known.get(umlClass.fqn)
+			if usr and known is not None:
+				self.decided[usr] = known
+			return
+
+		# process this class
+		wall, cpu = time.perf_counter(), time.process_time()
+		umlClass.Process(cursor)
+		self._addTime("process", wall, cpu)
+
+		# map it.
+		self.classes[umlClass.fqn] = umlClass
+		if usr:
+			self.decided[usr] = umlClass
+
+	#--------------------------------------------------------------------------
+	def _isExcludedFile(self, cursor, exclusions : ExclusionFilter) -> bool:
+		""" is this (top level) cursor in an excluded file? """
+		try:
+			if cursor.location.file is None:
+				return False
+			fileName = cursor.location.file.name
+		except Exception:
+			# let the walker have a go at it
+			return False
+		return exclusions.isExcludedFile(fileName)
+
+	#--------------------------------------------------------------------------
+	#
+	def _walkAst(self, root, exclusions : ExclusionFilter):
+		""" iterative, pre-order walk of the clang AST. yields class, class template and struct declarations """
+		stack = Stack()
+		stack.push((root, ""))
+		while not stack.is_empty():
+			cursor, namespace = stack.pop()
+			self.counters["visited"] += 1
+			# work-around for https://github.com/sighingnow/libclang/issues/25
+			# a bad node costs us that node, never its siblings or children
+			try:
+				kind = cursor.kind
+				if kind == clang.cindex.CursorKind.NAMESPACE:
+					# track the qualified name as clang spells it for classes
+					name = cursor.spelling if cursor.spelling else "(anonymous namespace)"
+					namespace = f"{namespace}::{name}" if namespace else name
+					# do not bother descending into namespaces that get filtered anyway
+					if exclusions.isExcludedNamespace(namespace):
+						dbmsg.log(3, "Pruning namespace: %s", namespace)
+						self.counters["skipped"] += 1
+						continue
+			except Exception:
+				self.counters["failed"] += 1
+				kind = None
+			try:
+				children = list(cursor.get_children())
+			except Exception:
+				self.counters["failed"] += 1
+				children = []
+			topLevel = kind == clang.cindex.CursorKind.TRANSLATION_UNIT
+			# reversed so they pop off in source order
+			for child in reversed(children):
+				# nothing declared in an excluded header is wanted
+				if topLevel and self._isExcludedFile(child, exclusions):
+					self.counters["skipped"] += 1
+					continue
+				stack.push((child, namespace))
+			if (kind == clang.cindex.CursorKind.CLASS_DECL
+					or kind == clang.cindex.CursorKind.STRUCT_DECL
+					or kind == clang.cindex.CursorKind.CLASS_TEMPLATE):
+				yield cursor
+
+	#--------------------------------------------------------------------------
+	#
+	def _traverseAst(self, cursor, exclusions : ExclusionFilter):
+		""" walk the clang AST and process every class, class template or struct declaration """
+		for classCursor in self._walkAst(cursor, exclusions):
+			try:
+				self._processClass(classCursor, exclusions)
+			except Exception:
+				self.counters["failed"] += 1
+
+	#--------------------------------------------------------------------------
+	#
+	def extract(self, filePath : str, clangArgs : list, exclusions : ExclusionFilter, known : dict = None, pch : str = None) -> list:
+		""" parse a single source file and return the new UmlClass records found in it.
+		classes already in known are not returned. pch names an optional precompiled prefix header """
+		self.classes = {}
+		self.known = known if known is not None else {}
+		self.names = {}
+		self.counters = self._newCounters()
+		self.decided = self.decisions.setdefault((tuple(clangArgs), pch, exclusions.key()), {})
+		if pch is not None:
+			clangArgs = clangArgs + [ '-include-pch', pch ]
+		wall, cpu = time.perf_counter(), time.process_time()
+		tu = self.getIndex().parse(filePath, args=clangArgs, options=clang.cindex.TranslationUnit.PARSE_SKIP_FUNCTION_BODIES)
+		self._addTime("parse", wall, cpu)
+		fatal = False
+		for diagnostic in tu.diagnostics:
+			dbmsg.log(1, "%s", diagnostic)
+			self.counters["diagnostics"] += 1
+			fatal = fatal or diagnostic.severity >= clang.cindex.Diagnostic.Fatal
+		# i.e. a missing header. the result depends on more than the files we can see.
+		self.includes = None if fatal else sorted(set(inc.include.name for inc in tu.get_includes()))
+		wall, cpu = time.perf_counter(), time.process_time()
+		self._traverseAst(tu.cursor, exclusions)
+		self._addTime("traverse", wall, cpu)
+		self.counters["kept"] = len(self.classes)
+		dbmsg.log(2, "%s: visited %d cursor(s), skipped %d subtree(s), %d failure(s)",
+			filePath, self.counters['visited'], self.counters['skipped'], self.counters['failed'])
+		classes = list(self.classes.values())
+		self.classes = {}
+		self.known = {}
+		return classes
+
+#------------------------------------------------------------------------------
+# process pool support. each worker process gets its own Extractor (and Index).
+_worker : Extractor = None
+
+#------------------------------------------------------------------------------
+def initWorker(args : dict) -> None:
+	""" process pool initializer """
+	global _worker
+	# forked workers inherit a loaded libclang, spawned ones do not.
+	if not Config.loaded:
+		Config.set_library_file(args[constants.libclangpath])
+	_worker = Extractor(args)
+	dbmsg.configure(int(args[constants.verbosity]), args.get(constants.logfile))
+
+#------------------------------------------------------------------------------
+def extractWorker(job : tuple) -> tuple:
+	""" process pool task: (filePath, clangArgs, exclusions, pch) -> (filePath, [UmlClass], [includes], counters) """
+	filePath, clangArgs, exclusions, pch = job
+	classes = _worker.extract(filePath, clangArgs, exclusions, pch=pch)
+	# pool workers are terminated, not exited. do not lose buffered output.
+	dbmsg.flush()
+	return filePath, classes, _worker.includes, _worker.counters
@@ -0,0 +1,134 @@
+#
+#	BSD 3-Clause License
+#
+#   Copyright (c) 2022, Jerry Evans
+#   All rights reserved.
+#   See LICENCE.md for full details
+#
+
+import os
+import re
+
+#------------------------------------------------------------------------------
+class IncludeGraph:
+	""" The project #include graph from a plain text scan, no preprocessor.
+
+	Every #include counts, conditional or not, and macro includes are not
+	followed, so a unit may not really see a header the graph says it does.
+	What cover() picks has to be checked against clang's own includes once it
+	is parsed. Headers under the system directories, or excluded by the
+	exclusion filter, are not project headers and are ignored. """
+
+	includeRe = re.compile(r'^[ \t]*#[ \t]*include[ \t]*([<"])([^">\n]+)[">]', re.M)
+	# conservative. a forward declaration or a comment still counts.
+	declarationRe = re.compile(r'\b(class|struct)\b')
+
+	#--------------------------------------------------------------------------
+	def __init__(self, systemDirs : list, exclusions = None):
+		""" constructor. exclusions is an ExclusionFilter, or None """
+		self.systemDirs = tuple(os.path.join(os.path.abspath(d), "") for d in systemDirs)
+		self.exclusions = exclusions
+		# file -> [(quoted?, name)] as written
+		self.directives = {}
+		# file -> declares a class or struct?
+		self.declarations = {}
+		# (file, include dirs) -> [resolved project headers]
+		self.edges = {}
+
+	#--------------------------------------------------------------------------
+	def _read(self, fileName : str) -> None:
+		""" scan a file once """
+		try:
+			with open(fileName, "r", errors="replace") as f:
+				text = f.read()
+		except OSError:
+			text = ""
+		self.directives[fileName] = [ (m.group(1) == '"', m.group(2).strip()) for m in self.includeRe.finditer(text) ]
+		self.declarations[fileName] = self.declarationRe.search(text) is not None
+
+	#--------------------------------------------------------------------------
+	def _isProjectFile(self, fileName : str) -> bool:
+		if fileName.startswith(self.systemDirs):
+			return False
+		return self.exclusions is None or not self.exclusions.isExcludedFile(fileName)
+
+	#--------------------------------------------------------------------------
+	def includes(self, fileName : str, includeDirs : tuple) -> list:
+		""" the project headers fileName includes directly """
+		key = (fileName, includeDirs)
+		resolved = self.edges.get(key)
+		if resolved is not None:
+			return resolved
+		if fileName not in self.directives:
+			self._read(fileName)
+		resolved = []
+		for quoted, name in self.directives[fileName]:
+			# "x.h" looks next to the includer first
+			searchDirs = ((os.path.dirname(fileName),) if quoted else ()) + includeDirs
+			for directory in searchDirs:
+				path = os.path.normpath(os.path.join(directory, name))
+				if os.path.isfile(path):
+					if self._isProjectFile(path):
+						resolved.append(path)
+					break
+		self.edges[key] = resolved
+		return resolved
+
+	#--------------------------------------------------------------------------
+	def closure(self, sourceFile : str, includeDirs : tuple) -> set:
+		""" every project header sourceFile pulls in, directly or not """
+		seen = set()
+		pending = [ os.path.abspath(sourceFile) ]
+		while len(pending) > 0:
+			for header in self.includes(pending.pop(), includeDirs):
+				if header not in seen:
+					seen.add(header)
+					pending.append(header)
+		return seen
+
+	#--------------------------------------------------------------------------
+	def declaresClasses(self, fileName : str) -> bool:
+		""" might fileName itself declare a class? """
+		if fileName not in self.declarations:
+			self._read(fileName)
+		return self.declarations[fileName]
+
+	#--------------------------------------------------------------------------
+	def cover(self, units : list, seen : set = frozenset()) -> list:
+		""" a small subset of (source file, clang args) units that between them see every
+		project header, and every source file with classes of its own, bar those already
+		seen (absolute paths). greedy set cover, ties go to the earlier unit so the choice is stable """
+		needs = []
+		for sourceFile, clangArgs in units:
+			need = set(h for h in self.closure(sourceFile, includeDirs(clangArgs)) if self.declaresClasses(h))
+			if self.declaresClasses(os.path.abspath(sourceFile)):
+				need.add(os.path.abspath(sourceFile))
+			needs.append(set(h for h in need if os.path.abspath(h) not in seen))
+		uncovered = set().union(*needs) if len(needs) > 0 else set()
+		chosen = []
+		while len(uncovered) > 0:
+			best = max(range(len(units)), key=lambda i: (len(needs[i] & uncovered), -i))
+			chosen.append(best)
+			uncovered -= needs[best]
+		return [ units[i] for i in sorted(chosen) ]
+
+	#--------------------------------------------------------------------------
+	def stubs(self, units : list) -> list:
+		""" (file, clang args) for every project header with classes, each parsed on its own,
+		plus the source files with classes of their own. a header reached with different
+		args is parsed with the first """
+		stubs = {}
+		for sourceFile, clangArgs in units:
+			if self.declaresClasses(os.path.abspath(sourceFile)):
+				stubs.setdefault(os.path.abspath(sourceFile), (sourceFile, clangArgs))
+			# clang would take a .h for C, and frown at #pragma once in a main file
+			headerArgs = (list(clangArgs) if "-x" in clangArgs else [ "-x", "c++" ] + list(clangArgs)) + [ "-Wno-pragma-once-outside-header" ]
+			for header in sorted(self.closure(sourceFile, includeDirs(clangArgs))):
+				if self.declaresClasses(header):
+					stubs.setdefault(header, (header, headerArgs))
+		return list(stubs.values())
+
+#------------------------------------------------------------------------------
+def includeDirs(clangArgs : list) -> tuple:
+	""" the -I directories in a (canonical, -Idir) argument list, in order """
+	return tuple(arg[2:] for arg in clangArgs if arg.startswith("-I"))
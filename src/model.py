@@ -0,0 +1,213 @@
+#
+#	BSD 3-Clause License
+#
+#   Copyright (c) 2022, Jerry Evans
+#   All rights reserved.
+#   See LICENCE.md for full details
+#
+#
+# Credit for originally showcasing Python/libclang usage:
+#   https://github.com/gklingler/CodeDependencyVisualizer
+#
+
+import os
+import sys
+import clang.cindex
+from .dbmsg import dbmsg
+
+#------------------------------------------------------------------------------
+# UML access prefixes, in the order classes show them
+PUBLIC = '+'
+PROTECTED = '#'
+PRIVATE = '-'
+accessOrder = (PUBLIC, PROTECTED, PRIVATE)
+accessSpecifiers = {
+	clang.cindex.AccessSpecifier.PUBLIC : PUBLIC,
+	clang.cindex.AccessSpecifier.PROTECTED : PROTECTED,
+	clang.cindex.AccessSpecifier.PRIVATE : PRIVATE }
+
+#------------------------------------------------------------------------------
+class UmlClass:
+	""" The extracted model of one class, struct or class template.
+
+	Tens of thousands of these can be alive at once, so there is no __dict__,
+	every string is interned (the same few type spellings turn up everywhere)
+	and the members are kept in two tuples:
+		fields  : (access, name, (displayType, templateOrTypeRef, ...))
+		methods : (access, static, virtual, returnType, name, arguments)
+	each in declaration order. Rendering lives in umlgen.DotGenerator. """
+
+	__slots__ = ("fqn", "filename", "line", "isDefinition", "parents", "fields", "methods")
+
+	#--------------------------------------------------------------------------
+	def __init__(self, cursor : clang.cindex.Cursor = None):
+		""" Create a UmlClass from a clang cursor. Process() adds the members """
+		self.fqn = ""
+		self.filename = ""
+		self.line = 0
+		# False for a forward declaration. a definition always replaces one.
+		self.isDefinition = True
+		self.parents = ()
+		self.fields = ()
+		self.methods = ()
+		if cursor is None:
+			return
+		# where are we at?
+		self.filename = sys.intern(os.path.abspath(cursor.location.file.name).strip())
+		self.line = cursor.location.line
+		self.isDefinition = cursor.is_definition()
+		# the fully qualified name as in a::b::c
+		if cursor.kind == clang.cindex.CursorKind.CLASS_TEMPLATE:
+			# process declarations like:
+			# template <typename T> class MyClass
+			self.fqn = sys.intern(cursor.spelling)
+		else:
+			# process declarations like:
+			# class MyClass or struct MyStruct
+			self.fqn = sys.intern(cursor.type.spelling)
+
+	#--------------------------------------------------------------------------
+	def setMembers(self, parents : list, fields : list, methods : list) -> None:
+		""" freeze parents, fields and methods (layout as above) into interned tuples """
+		intern = sys.intern
+		self.parents = tuple(intern(parent) for parent in parents)
+		self.fields = tuple((access, intern(name), tuple(intern(t) for t in types))
+			for access, name, types in fields)
+		self.methods = tuple((access, static, virtual, intern(returnType), intern(name), intern(arguments))
+			for access, static, virtual, returnType, name, arguments in methods)
+
+	#--------------------------------------------------------------------------
+	def getId(self) -> str:
+		""" generate a unique label for graphviz """
+		# sad but required to avoid problems with graphviz IDs
+		return self.getFQN().replace("::","__")
+
+	#--------------------------------------------------------------------------
+	def getFQN(self) -> str:
+		""" get the fully qualified classname"""
+		return self.fqn
+
+	#--------------------------------------------------------------------------
+	def getUQN(self) -> str:
+		""" get the unqualified classname"""
+		parts = str.split(self.getId(),"__")
+		return parts[-1]
+
+	#--------------------------------------------------------------------------
+	def getNamespace(self) -> str:
+		""" get the fully namespace as a string"""
+		ns = ""
+		parts:list[str] = str.split(self.getId(),"__")
+		if len(parts) > 0:
+			ns = "__".join(parts[:-1])
+		return ns
+
+	#--------------------------------------------------------------------------
+	def getInnerNamespace(self) -> str:
+		""" get the innermost namespace as a string"""
+		ns = ""
+		parts = str.split(self.getId(),"__")
+		if len(parts) > 1:
+			ns = parts[-2]
+		return ns
+
+	#--------------------------------------------------------------------------
+	def getNamespaceDepth(self) -> int:
+		""" how deep is the namespace nesting. global == 0 """
+		depth = 0
+		parts = str.split(self.getId(),"__")
+		if len(parts) > 0:
+			depth = len(parts) - 1
+		return depth
+
+	#--------------------------------------------------------------------------
+	def getLocation(self) -> str:
+		""" where are we defined in a source file? """
+		return str(f"{self.filename}:{self.line}\n")
+
+	#--------------------------------------------------------------------------
+	def getFields(self, access : str) -> list:
+		""" (name, types) of the fields with this access """
+		return [ (name, types) for a, name, types in self.fields if a == access ]
+
+	#--------------------------------------------------------------------------
+	def getMethods(self, access : str) -> list:
+		""" (static, virtual, returnType, name, arguments) of the methods with this access """
+		return [ m[1:] for m in self.methods if m[0] == access ]
+
+	#--------------------------------------------------------------------------
+	def isUnamed(self) -> bool:
+		""" dump unamed structs  """
+		ret = "(unnamed struct" in self.fqn
+		return ret
+
+	#--------------------------------------------------------------------------
+	def isAnonymous(self) -> bool:
+		""" dump anonymous structs  """
+		ret = "(anonymous struct" in self.fqn
+		return ret
+
+	#--------------------------------------------------------------------------
+	def _processClassField(self,cursor):
+		""" Returns the name and the type of the given class field.
+		The cursor must be of kind CursorKind.FIELD_DECL"""
+		# the first element of types is for display purpose. Form 2nd to Nth element,
+		# they are template type argurment in the chain list
+		types = list()
+		fieldChilds = list(cursor.get_children())
+		if len(fieldChilds) == 0:  # if there are not cursorchildren, the type is some primitive datatype
+			types.append(cursor.type.spelling)
+		else:  # if there are cursorchildren, the type is some non-primitive datatype (a class or class template)
+			types.append(cursor.type.spelling)
+			for cc in fieldChilds:
+				if cc.kind == clang.cindex.CursorKind.TEMPLATE_REF:
+					types.append(cc.spelling)
+				elif cc.kind == clang.cindex.CursorKind.TYPE_REF:
+					types.append(cc.type.spelling)
+		name = cursor.spelling
+		return name, types
+
+	#------------------------------------------------------------------------------
+	def _processClassMemberDeclaration(self, cursor, parents : list, fields : list, methods : list):
+		""" Processes a cursor corresponding to a class member declaration and
+		appends the extracted information to parents, fields or methods """
+		s = "static" if cursor.is_static_method() else ""
+		v = "virtual" if cursor.is_virtual_method() else ""
+		if cursor.kind == clang.cindex.CursorKind.CXX_BASE_SPECIFIER:
+			for baseClass in cursor.get_children():
+				if baseClass.kind == clang.cindex.CursorKind.TEMPLATE_REF:
+					parents.append(baseClass.spelling)
+				elif baseClass.kind == clang.cindex.CursorKind.TYPE_REF:
+					parents.append(baseClass.type.spelling)
+		# non static data member
+		elif cursor.kind == clang.cindex.CursorKind.FIELD_DECL:
+			name, types = self._processClassField(cursor)
+			access = accessSpecifiers.get(cursor.access_specifier)
+			if name is not None and types is not None and access is not None:
+				fields.append((access, name, types))
+		elif cursor.kind == clang.cindex.CursorKind.CXX_METHOD or\
+				cursor.kind == clang.cindex.CursorKind.CONSTRUCTOR or\
+				cursor.kind == clang.cindex.CursorKind.DESTRUCTOR:
+			try:
+				returnType, argumentTypes = cursor.type.spelling.split(' ', 1)
+				access = accessSpecifiers.get(cursor.access_specifier)
+				if access is not None:
+					methods.append((access, s, v, returnType, cursor.spelling, argumentTypes))
+			except:
+				dbmsg.debug("Error Invalid declaration: {cursor.type.spelling}")
+		elif cursor.kind == clang.cindex.CursorKind.FUNCTION_TEMPLATE:
+			returnType, argumentTypes = cursor.type.spelling.split(' ', 1)
+			access = accessSpecifiers.get(cursor.access_specifier)
+			if access is not None:
+				methods.append((access, s, v, returnType, cursor.spelling, argumentTypes))
+
+	#--------------------------------------------------------------------------
+	def Process(self,cursor):
+		""" process this class """
+		parents = []
+		fields = []
+		methods = []
+		for c in cursor.get_children():
+			# process member variables and methods declarations
+			self._processClassMemberDeclaration(c, parents, fields, methods)
+		self.setMembers(parents, fields, methods)
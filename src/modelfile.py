@@ -0,0 +1,128 @@
+#
+#	BSD 3-Clause License
+#
+#   Copyright (c) 2022, Jerry Evans
+#   All rights reserved.
+#   See LICENCE.md for full details
+#
+
+import json
+import pickle
+from .model import UmlClass
+from .umlgen import splitQualifiedName
+
+#------------------------------------------------------------------------------
+class _PlainUnpickler(pickle.Unpickler):
+	""" only builtin containers and scalars. a model file can never run code """
+
+	def find_class(self, module, name):
+		raise pickle.UnpicklingError(f"Unexpected {module}.{name} in model file")
+
+#------------------------------------------------------------------------------
+class ModelFile:
+	""" The extracted class graph on disk, so it can be rendered (or checked,
+	or published) again without going near libclang.
+
+	Names ending .jsonl are JSON lines, one record per line, for streaming and
+	for other tools:
+		{"kind": "model", "format": "cppuml-model", "version": 1, "root": ...}
+		{"kind": "class", "fqn": ..., "file": ..., "line": ..., "definition": ...,
+			"namespace": [...], "parents": [...], "associations": [...],
+			"fields": [[access, name, [types]]],
+			"methods": [[access, static, virtual, returnType, name, arguments]]}
+		{"kind": "unit", "file": ..., "classes": [fqn, ...]}
+	namespace and associations are derived, for readers, and ignored on load.
+	Anything else is the binary form: a pickle of builtin types only, which
+	reloads several times faster. """
+
+	format = "cppuml-model"
+	# bump if the layout changes incompatibly
+	version = 1
+
+	#--------------------------------------------------------------------------
+	def __init__(self, fileName : str):
+		""" constructor """
+		self.fileName = fileName
+		self.binary = not fileName.endswith(".jsonl")
+
+	#--------------------------------------------------------------------------
+	def _classRecord(self, umlClass : UmlClass) -> tuple:
+		""" (fqn, file, line, definition, parents, fields, methods) """
+		return (umlClass.fqn, umlClass.filename, umlClass.line, umlClass.isDefinition,
+			umlClass.parents, umlClass.fields, umlClass.methods)
+
+	#--------------------------------------------------------------------------
+	def _fromRecord(self, record) -> UmlClass:
+		""" a UmlClass from a binary or JSON class record """
+		fqn, filename, line, isDefinition, parents, fields, methods = record
+		umlClass = UmlClass()
+		umlClass.fqn = fqn
+		umlClass.filename = filename
+		umlClass.line = line
+		umlClass.isDefinition = isDefinition
+		umlClass.setMembers(parents, fields, methods)
+		return umlClass
+
+	#--------------------------------------------------------------------------
+	def write(self, root : str, classes, units : list) -> None:
+		""" save UmlClass instances plus (source file, [fqn]) units. root is the source directory """
+		header = { "kind" : "model", "format" : self.format, "version" : self.version, "root" : root }
+		if self.binary:
+			model = dict(header)
+			model["classes"] = [ self._classRecord(umlClass) for umlClass in classes ]
+			model["units"] = [ (sourceFile, list(names)) for sourceFile, names in units ]
+			with open(self.fileName, "wb") as f:
+				pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+			return
+		# one line per record, written as we go
+		classes = list(classes)
+		known = set(umlClass.fqn for umlClass in classes)
+		with open(self.fileName, "w") as f:
+			f.write(json.dumps(header) + "\n")
+			for umlClass in classes:
+				fqn, filename, line, isDefinition, parents, fields, methods = self._classRecord(umlClass)
+				associations = sorted(set(t for access, name, types in fields for t in types if t in known))
+				f.write(json.dumps({ "kind" : "class", "fqn" : fqn, "file" : filename, "line" : line, "definition" : isDefinition,
+					"namespace" : splitQualifiedName(fqn)[:-1], "parents" : parents, "associations" : associations,
+					"fields" : fields, "methods" : methods }) + "\n")
+			for sourceFile, names in units:
+				f.write(json.dumps({ "kind" : "unit", "file" : sourceFile, "classes" : list(names) }) + "\n")
+
+	#--------------------------------------------------------------------------
+	def _checkHeader(self, header : dict) -> None:
+		""" is this a model we can read? """
+		if header.get("format") != self.format:
+			raise Exception(f"{self.fileName} is not a cppuml model")
+		if header.get("version") != self.version:
+			raise Exception(f"{self.fileName} is model version {header.get('version')}, expected {self.version}")
+
+	#--------------------------------------------------------------------------
+	def read(self) -> tuple:
+		""" load a model. returns (root, [UmlClass], [(source file, [fqn])]) """
+		if self.binary:
+			with open(self.fileName, "rb") as f:
+				model = _PlainUnpickler(f).load()
+			if not isinstance(model, dict):
+				raise Exception(f"{self.fileName} is not a cppuml model")
+			self._checkHeader(model)
+			classes = [ self._fromRecord(record) for record in model["classes"] ]
+			return model["root"], classes, model["units"]
+		classes = []
+		units = []
+		header = None
+		with open(self.fileName, "r") as f:
+			for line in f:
+				if line.strip() == "":
+					continue
+				record = json.loads(line)
+				if header is None:
+					header = record
+					self._checkHeader(header)
+				elif record["kind"] == "class":
+					classes.append(self._fromRecord((record["fqn"], record["file"], record["line"], record["definition"],
+						record["parents"], record["fields"], record["methods"])))
+				elif record["kind"] == "unit":
+					units.append((record["file"], record["classes"]))
+		if header is None:
+			raise Exception(f"{self.fileName} is empty")
+		return header["root"], classes, units
@@ -0,0 +1,78 @@
+#
+#	BSD 3-Clause License
+#
+#   Copyright (c) 2022, Jerry Evans
+#   All rights reserved.
+#   See LICENCE.md for full details
+#
+
+import os
+import shutil
+import tempfile
+import clang.cindex
+from .dbmsg import dbmsg
+
+#------------------------------------------------------------------------------
+class PrecompiledHeader:
+	""" Build a common prefix header into a PCH once and share it between TUs.
+
+	A PCH is only usable with the options it was built with, so one is built per
+	distinct set of clang args. They live in a private temporary directory for
+	the duration of the run. """
+
+	#--------------------------------------------------------------------------
+	def __init__(self, headerName : str, getIndex):
+		""" constructor. getIndex returns the clang Index to build with. """
+		self.headerName = os.path.abspath(headerName)
+		if not os.path.exists(self.headerName):
+			raise Exception(f"Cannot find prefix header {self.headerName}")
+		self.getIndex = getIndex
+		self.pchDir = None
+		# tuple(clang args) -> PCH file name, None if it could not be built
+		self.built = {}
+		# tuple(clang args) -> files baked into the PCH
+		self.includes = {}
+
+	#--------------------------------------------------------------------------
+	def get(self, clangArgs : list) -> str:
+		""" the PCH for these args, building it on first use. None on failure """
+		key = tuple(clangArgs)
+		if key in self.built:
+			return self.built[key]
+		if self.pchDir is None:
+			self.pchDir = tempfile.mkdtemp(prefix="cppuml-pch-")
+		pchName = os.path.join(self.pchDir, f"prefix{len(self.built)}.pch")
+		dbmsg.debug(f"Precompiling {self.headerName} -> {pchName}")
+		# the trailing -x applies to the header itself
+		tu = self.getIndex().parse(self.headerName, args=list(clangArgs) + ['-x', 'c++-header'],
+			options=clang.cindex.TranslationUnit.PARSE_INCOMPLETE | clang.cindex.TranslationUnit.PARSE_SKIP_FUNCTION_BODIES)
+		fatal = False
+		for diagnostic in tu.diagnostics:
+			dbmsg.log(1, "%s", diagnostic)
+			fatal = fatal or diagnostic.severity >= clang.cindex.Diagnostic.Fatal
+		if not fatal:
+			try:
+				tu.save(pchName)
+			except clang.cindex.TranslationUnitSaveError as e:
+				dbmsg.debug(f"{e}")
+				fatal = True
+		if fatal:
+			dbmsg.debug(f"Cannot precompile {self.headerName}. Parsing without it.")
+			pchName = None
+		self.built[key] = pchName
+		self.includes[key] = [self.headerName] + sorted(set(inc.include.name for inc in tu.get_includes()))
+		return pchName
+
+	#--------------------------------------------------------------------------
+	def getIncludes(self, clangArgs : list) -> list:
+		""" files a TU built with this PCH depends on but which clang will not report """
+		return self.includes.get(tuple(clangArgs), [])
+
+	#--------------------------------------------------------------------------
+	def cleanup(self) -> None:
+		""" remove any PCH files """
+		if self.pchDir is not None:
+			shutil.rmtree(self.pchDir, ignore_errors=True)
+			self.pchDir = None
+		self.built = {}
+		self.includes = {}
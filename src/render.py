@@ -0,0 +1,144 @@
+#
+#	BSD 3-Clause License
+#
+#   Copyright (c) 2022, Jerry Evans
+#   All rights reserved.
+#   See LICENCE.md for full details
+#
+
+import os
+import time
+import queue
+import threading
+import subprocess
+from .dbmsg import dbmsg
+
+#------------------------------------------------------------------------------
+class Renderer:
+	""" Render DOT files to SVG using a bounded pool of `dot` subprocesses.
+
+	submit() queues a file and returns immediately so the caller can get on with
+	parsing. finish() waits for everything queued and returns the results.
+	After a successful render the digest of the DOT content, if given, is kept
+	in a <name>.sha256 sidecar so unchanged diagrams can be skipped next time.
+	Any Graphviz layout engine can be used. If a render times out and a fallback
+	was given, it is called to rewrite the DOT more simply and the render is retried. """
+
+	#--------------------------------------------------------------------------
+	def __init__(self, jobs : int = 1, timeout : float = 0):
+		""" constructor. timeout is per render, in seconds. 0 == wait forever """
+		self.jobs = max(1, jobs)
+		self.timeout = timeout if timeout > 0 else None
+		# bounded so we never get too far ahead of the renderers
+		self.queue = queue.Queue(maxsize=2 * self.jobs)
+		self.lock = threading.Lock()
+		# dotfileName -> (ok, seconds, message)
+		self.results = {}
+		# renders retried with the fallback
+		self.fallbacks = 0
+		self.threads = []
+
+	#--------------------------------------------------------------------------
+	def _render(self, dotfileName : str, engine : str) -> tuple:
+		""" lay out one file with engine. returns (ok, seconds, message, timed out?) """
+		command = ["dot", f"-K{engine}", "-Tsvg", "-O", dotfileName]
+		# spring models pile nodes on top of each other otherwise
+		if engine != "dot":
+			command[1:1] = ["-Goverlap=prism"]
+		start = time.perf_counter()
+		timedOut = False
+		try:
+			proc = subprocess.run(command, capture_output=True, text=True, timeout=self.timeout)
+			ok = proc.returncode == 0
+			message = "" if ok else f"dot returned {proc.returncode}: {proc.stderr.strip()}"
+		except subprocess.TimeoutExpired:
+			ok = False
+			timedOut = True
+			message = f"{engine} timed out after {self.timeout}s"
+		except OSError as e:
+			ok = False
+			message = f"cannot run dot: {e}"
+		return ok, time.perf_counter() - start, message, timedOut
+
+	#--------------------------------------------------------------------------
+	def renderedDigest(dotfileName : str) -> str:
+		""" digest of the DOT content behind the current SVG, None if unknown """
+		try:
+			with open(f"{dotfileName}.sha256", "r") as f:
+				return f.read().strip()
+		except OSError:
+			return None
+
+	#--------------------------------------------------------------------------
+	def _renderItem(self, dotfileName : str, digest : str, engine : str, fallback) -> tuple:
+		""" render one queued file, with the fallback if it times out. returns (ok, seconds, message) """
+		sidecar = f"{dotfileName}.sha256"
+		if os.path.exists(sidecar):
+			os.remove(sidecar)
+		ok, seconds, message, timedOut = self._render(dotfileName, engine)
+		if timedOut and fallback is not None:
+			dbmsg.debug(f"{message} on {dotfileName}. Trying the fallback")
+			with self.lock:
+				self.fallbacks += 1
+			# the SVG still stands for the DOT we were given, so the digest is kept
+			engine = fallback()
+			ok, retry, message, timedOut = self._render(dotfileName, engine)
+			seconds += retry
+		if ok and digest is not None:
+			with open(sidecar, "w") as f:
+				f.write(digest)
+		return ok, seconds, message
+
+	#--------------------------------------------------------------------------
+	def _worker(self) -> None:
+		""" render thread """
+		while True:
+			item = self.queue.get()
+			try:
+				if item is None:
+					return
+				dotfileName, digest, engine, fallback = item
+				start = time.perf_counter()
+				try:
+					ok, seconds, message = self._renderItem(dotfileName, digest, engine, fallback)
+				except Exception as e:
+					# one bad diagram must not take the thread, and everything queued behind it, down
+					ok, seconds, message = False, time.perf_counter() - start, f"render failed: {e}"
+				if ok:
+					dbmsg.debug(f"Generated {dotfileName}.svg in {seconds:.2f}s")
+				else:
+					dbmsg.debug(f"Failed {dotfileName}.svg: {message}")
+				with self.lock:
+					self.results[dotfileName] = (ok, seconds, message)
+			finally:
+				self.queue.task_done()
+
+	#--------------------------------------------------------------------------
+	def submit(self, dotfileName : str, digest : str = None, engine : str = "dot", fallback = None) -> None:
+		""" queue a DOT file for rendering. blocks only if the queue is full.
+		fallback() rewrites the file after a timeout and returns the engine for the retry """
+		if len(self.threads) == 0:
+			for i in range(self.jobs):
+				thread = threading.Thread(target=self._worker, name=f"dot-{i}", daemon=True)
+				thread.start()
+				self.threads.append(thread)
+		self.queue.put((dotfileName, digest, engine, fallback))
+
+	#--------------------------------------------------------------------------
+	def finish(self) -> dict:
+		""" wait for all queued renders. returns dotfileName -> (ok, seconds, message) """
+		for thread in self.threads:
+			self.queue.put(None)
+		for thread in self.threads:
+			thread.join()
+		self.threads = []
+		return self.results
+
+	#--------------------------------------------------------------------------
+	def summary(self) -> str:
+		""" render time report """
+		times = [ seconds for ok, seconds, message in self.results.values() ]
+		failed = sum(1 for ok, seconds, message in self.results.values() if not ok)
+		if len(times) == 0:
+			return "Rendered 0 file(s)"
+		return f"Rendered {len(times) - failed} file(s), {failed} failure(s), {self.fallbacks} fallback(s). {sum(times):.2f}s total, {max(times):.2f}s longest"
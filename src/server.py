@@ -0,0 +1,158 @@
+#
+#	BSD 3-Clause License
+#
+#   Copyright (c) 2022, Jerry Evans
+#   All rights reserved.
+#   See LICENCE.md for full details
+#
+#   Nothing here may import clang: the client has to start fast.
+#
+
+import os
+import json
+import time
+import socket
+from .constants import constants
+from .dbmsg import dbmsg
+
+#------------------------------------------------------------------------------
+def _receive(connection) -> dict:
+	""" read one newline terminated JSON message """
+	data = b""
+	while not data.endswith(b"\n"):
+		chunk = connection.recv(65536)
+		if not chunk:
+			break
+		data += chunk
+	if data.strip() == b"":
+		raise Exception("Empty message")
+	return json.loads(data)
+
+#------------------------------------------------------------------------------
+def _send(connection, message : dict) -> None:
+	""" write one newline terminated JSON message """
+	connection.sendall(json.dumps(message).encode() + b"\n")
+
+#------------------------------------------------------------------------------
+class Server:
+	""" Keep an Application resident, with its libclang Index, system include
+	paths and extracted classes, and take requests on a local Unix socket.
+
+	One JSON request per connection, one JSON reply, each a single line:
+		{"command": "update", "files": [...]}  reparse these (none == all) and rewrite their diagrams
+		{"command": "status"}
+		{"command": "stop"}
+	Replies carry "ok" and "message", plus "outputs" (DOT files written) for an update. """
+
+	#--------------------------------------------------------------------------
+	def __init__(self, app, socketPath : str):
+		""" constructor. app has already parsed everything once """
+		self.app = app
+		self.socketPath = os.path.abspath(socketPath)
+		self.started = time.time()
+		self.requests = 0
+
+	#--------------------------------------------------------------------------
+	def _bind(self) -> socket.socket:
+		""" listen on the socket, clearing away one left by a server that died """
+		if os.path.exists(self.socketPath):
+			probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+			try:
+				probe.connect(self.socketPath)
+				raise Exception(f"Already serving on {self.socketPath}")
+			except (ConnectionRefusedError, FileNotFoundError):
+				os.remove(self.socketPath)
+			finally:
+				probe.close()
+		listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		listener.bind(self.socketPath)
+		# the source tree is ours alone
+		os.chmod(self.socketPath, 0o600)
+		listener.listen(8)
+		return listener
+
+	#--------------------------------------------------------------------------
+	def _handle(self, request : dict) -> dict:
+		""" run one request. returns the reply """
+		command = request.get("command")
+		if command == "update":
+			start = time.perf_counter()
+			outputs = self.app.update(request.get("files", []))
+			seconds = time.perf_counter() - start
+			return { "ok" : True, "message" : f"{len(outputs)} diagram(s) in {seconds:.2f}s. {self.app.stats.summary()}",
+				"outputs" : outputs }
+		if command == "status":
+			return { "ok" : True, "message" : f"{self.app.dotGenerator.count()} class(es) from {len(self.app.unitClasses)} file(s). "
+				f"{self.requests} request(s) in {time.time() - self.started:.0f}s" }
+		if command == "stop":
+			return { "ok" : True, "message" : "Stopping" }
+		return { "ok" : False, "message" : f"Unknown command {command}" }
+
+	#--------------------------------------------------------------------------
+	def serve(self) -> None:
+		""" take requests, one at a time, until asked to stop """
+		listener = self._bind()
+		dbmsg.debug(f"Serving on {self.socketPath}")
+		dbmsg.flush()
+		try:
+			while True:
+				connection, address = listener.accept()
+				with connection:
+					self.requests += 1
+					try:
+						request = _receive(connection)
+						reply = self._handle(request)
+					except Exception as e:
+						request = {}
+						reply = { "ok" : False, "message" : f"{e}" }
+					dbmsg.flush()
+					try:
+						_send(connection, reply)
+					except OSError as e:
+						dbmsg.debug(f"Lost client: {e}")
+				if request.get("command") == "stop":
+					break
+		finally:
+			listener.close()
+			if os.path.exists(self.socketPath):
+				os.remove(self.socketPath)
+		dbmsg.debug(f"Stopped serving on {self.socketPath}")
+
+#------------------------------------------------------------------------------
+def request(socketPath : str, message : dict) -> dict:
+	""" send one request to a server and wait for the reply """
+	with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+		connection.connect(socketPath)
+		_send(connection, message)
+		return _receive(connection)
+
+#------------------------------------------------------------------------------
+def clientMain(argv : list) -> int:
+	""" main.py client [--socket path] [--status|--stop] [file ...]. returns the exit code """
+	socketPath = constants.socketname
+	command = "update"
+	files = []
+	index = 0
+	while index < len(argv):
+		switch = argv[index]
+		if switch == "--socket":
+			index += 1
+			socketPath = argv[index]
+		elif switch in ("--status", "--stop"):
+			command = switch[2:]
+		else:
+			# relative to us, not to the server
+			files.append(os.path.abspath(switch))
+		index += 1
+	message = { "command" : command }
+	if command == "update":
+		message["files"] = files
+	try:
+		reply = request(socketPath, message)
+	except OSError as e:
+		print(f"Cannot reach a server on {socketPath}: {e}")
+		return -1
+	print(reply.get("message", ""))
+	for output in reply.get("outputs", []):
+		print(output)
+	return 0 if reply.get("ok") else -1
@@ -0,0 +1,115 @@
+#
+#	BSD 3-Clause License
+#
+#   Copyright (c) 2022, Jerry Evans
+#   All rights reserved.
+#   See LICENCE.md for full details
+#
+
+import os
+import sys
+import json
+import time
+import contextlib
+
+#------------------------------------------------------------------------------
+class Stats:
+	""" Per phase timings and counters for one run.
+
+	Phases are timed in the main process. Per TU figures (parse, traverse and
+	UmlClass.Process times, cursors, classes, diagnostics) come from whichever
+	process did the extraction and are added with addUnit(). Per diagram
+	figures (classes, DOT bytes, generate and dot times) go in with addDiagram(). """
+
+	# bump if the report layout changes incompatibly
+	version = 1
+
+	#--------------------------------------------------------------------------
+	def __init__(self):
+		self.startWall = time.perf_counter()
+		self.startCpu = time.process_time()
+		# phase -> { wall, cpu, count }
+		self.phases = {}
+		# run wide counters, summed over TUs
+		self.totals = {}
+		# one record per TU
+		self.units = []
+		# DOT file name -> one record per diagram
+		self.diagrams = {}
+
+	#--------------------------------------------------------------------------
+	@contextlib.contextmanager
+	def phase(self, name : str):
+		""" with stats.phase("generate"): ... """
+		wall = time.perf_counter()
+		cpu = time.process_time()
+		try:
+			yield
+		finally:
+			self.addPhase(name, time.perf_counter() - wall, time.process_time() - cpu)
+
+	#--------------------------------------------------------------------------
+	def addPhase(self, name : str, wall : float, cpu : float = 0.0) -> None:
+		""" accumulate time spent in a phase """
+		phase = self.phases.setdefault(name, { "wall" : 0.0, "cpu" : 0.0, "count" : 0 })
+		phase["wall"] += wall
+		phase["cpu"] += cpu
+		phase["count"] += 1
+
+	#--------------------------------------------------------------------------
+	def add(self, name : str, value = 1) -> None:
+		""" bump a run wide counter """
+		self.totals[name] = self.totals.get(name, 0) + value
+
+	#--------------------------------------------------------------------------
+	def get(self, name : str):
+		""" a run wide counter. 0 if never set """
+		return self.totals.get(name, 0)
+
+	#--------------------------------------------------------------------------
+	def addUnit(self, sourceFile : str, counters : dict, cached : bool = False) -> None:
+		""" record the extraction counters for one TU and add them to the totals """
+		unit = { "file" : sourceFile, "cached" : cached }
+		unit.update(counters)
+		self.units.append(unit)
+		self.add("cached" if cached else "parsed")
+		for k,v in counters.items():
+			self.add(k, v)
+
+	#--------------------------------------------------------------------------
+	def addDiagram(self, dotfileName : str, values : dict) -> None:
+		""" record, or add to the record of, one diagram """
+		self.diagrams.setdefault(dotfileName, { "file" : dotfileName }).update(values)
+
+	#--------------------------------------------------------------------------
+	def report(self) -> dict:
+		""" everything, as a JSON friendly dict """
+		return {
+			"version" : self.version,
+			"pid" : os.getpid(),
+			"python" : sys.version.split()[0],
+			"wall" : time.perf_counter() - self.startWall,
+			"cpu" : time.process_time() - self.startCpu,
+			"phases" : self.phases,
+			"totals" : self.totals,
+			"units" : self.units,
+			"diagrams" : list(self.diagrams.values()),
+		}
+
+	#--------------------------------------------------------------------------
+	def write(self, fileName : str) -> None:
+		""" write the report as JSON """
+		with open(fileName, "w") as f:
+			json.dump(self.report(), f, indent=1, sort_keys=True)
+			f.write("\n")
+
+	#--------------------------------------------------------------------------
+	def summary(self) -> str:
+		""" a short human readable version """
+		s = lambda name: self.get(name)
+		phase = lambda name: self.phases.get(name, { "wall" : 0.0 })["wall"]
+		return (f"{s('parsed')} TU(s) parsed, {s('cached')} cached. "
+			f"parse {s('parseWall'):.2f}s, traverse {s('traverseWall'):.2f}s (of which process {s('processWall'):.2f}s). "
+			f"{s('kept')} class(es) kept, {s('excluded')} excluded, {s('diagnostics')} diagnostic(s). "
+			f"generate {phase('generate'):.2f}s for {s('dotBytes')} byte(s) of DOT, render {s('renderWall'):.2f}s. "
+			f"{time.perf_counter() - self.startWall:.2f}s total")
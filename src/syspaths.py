@@ -0,0 +1,99 @@
+#
+#	BSD 3-Clause License
+#
+#   Copyright (c) 2022, Jerry Evans
+#   All rights reserved.
+#   See LICENCE.md for full details
+#
+
+import os
+import sys
+import json
+import tempfile
+import ccsyspath
+from .dbmsg import dbmsg
+
+#------------------------------------------------------------------------------
+class SystemIncludePaths:
+	""" The directories clang searches for <...> includes, as ccsyspath finds them.
+
+	Finding them runs clang and reads its verbose output, so the answer is kept
+	on disk. It is reused while the clang binary, after following links, has the
+	same path, size and modification time, and every directory still exists. It
+	is looked up on first use, so runs that parse nothing never pay for it. """
+
+	# bump this if the file layout changes
+	version = 1
+	fileName = "syspaths.json"
+
+	#--------------------------------------------------------------------------
+	def __init__(self, clangPath : str, cacheDir : str = None):
+		""" constructor. cacheDir defaults to the user's cache directory """
+		self.clangPath = os.path.abspath(clangPath)
+		if not cacheDir:
+			cacheDir = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "cppuml")
+		self.cacheFile = os.path.join(cacheDir, self.fileName)
+		self.paths = None
+
+	#--------------------------------------------------------------------------
+	def _identity(self) -> dict:
+		""" what the cached answer depends on. a new clang build changes at least one of these """
+		realPath = os.path.realpath(self.clangPath)
+		st = os.stat(realPath)
+		return { "realpath" : realPath, "size" : st.st_size, "mtime" : st.st_mtime_ns }
+
+	#--------------------------------------------------------------------------
+	def _load(self) -> dict:
+		""" clang path -> entry. empty if missing, damaged or from another version """
+		try:
+			with open(self.cacheFile, "r") as f:
+				entries = json.load(f)
+		except (OSError, ValueError):
+			return {}
+		if not isinstance(entries, dict) or entries.get("version") != self.version:
+			return {}
+		return entries.get("clang", {})
+
+	#--------------------------------------------------------------------------
+	def _save(self, entries : dict) -> None:
+		""" atomic, so concurrent runs never see a partial write. failing to save is not an error """
+		try:
+			os.makedirs(os.path.dirname(self.cacheFile), exist_ok=True)
+			fd, tmpName = tempfile.mkstemp(dir=os.path.dirname(self.cacheFile))
+			try:
+				with os.fdopen(fd, "w") as f:
+					json.dump({ "version" : self.version, "clang" : entries }, f, indent=1)
+				os.replace(tmpName, self.cacheFile)
+			except Exception:
+				if os.path.exists(tmpName):
+					os.remove(tmpName)
+				raise
+		except OSError as e:
+			dbmsg.debug(f"Cannot save {self.cacheFile}: {e}")
+
+	#--------------------------------------------------------------------------
+	def _discover(self) -> list:
+		""" ask clang. slow """
+		return [ path.decode('utf-8') for path in ccsyspath.system_include_paths(self.clangPath) ]
+
+	#--------------------------------------------------------------------------
+	def get(self) -> list:
+		""" the system include directories. asks clang only if the cached answer is stale """
+		if self.paths is not None:
+			return self.paths
+		# needs to be OS independent
+		if sys.platform == "win32":
+			self.paths = []
+			return self.paths
+		identity = self._identity()
+		entries = self._load()
+		entry = entries.get(self.clangPath)
+		if (entry is not None and all(entry.get(k) == v for k, v in identity.items())
+				and all(os.path.isdir(path) for path in entry.get("paths", []))):
+			self.paths = entry["paths"]
+			return self.paths
+		self.paths = self._discover()
+		dbmsg.log(1, "%d system include path(s) from %s", len(self.paths), self.clangPath)
+		entries[self.clangPath] = dict(identity, paths=self.paths)
+		self._save(entries)
+		return self.paths
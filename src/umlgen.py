@@ -11,145 +11,266 @@
 # 
  
 
-import os
+import io
 import re
 import html
-import clang.cindex
-from .dbmsg import dbmsg
+import hashlib
+from .model import UmlClass, PUBLIC, PRIVATE, accessOrder
 
 #------------------------------------------------------------------------------
-class UmlClass:
+def splitQualifiedName(fqn : str) -> list:
+	""" split a::b<c::d>::e into ['a', 'b<c::d>', 'e'] """
+	parts = []
+	depth = 0
+	start = 0
+	i = 0
+	while i < len(fqn):
+		c = fqn[i]
+		if c == '<' or c == '(':
+			depth += 1
+		elif c == '>' or c == ')':
+			depth -= 1
+		elif depth == 0 and fqn.startswith("::", i):
+			parts.append(fqn[start:i])
+			i += 2
+			start = i
+			continue
+		i += 1
+	parts.append(fqn[start:])
+	return parts
 
-	def __init__(self,cursor : clang.cindex.Cursor, absDirectory: str ,generate_href : bool = True):
-		""" Create a UmlClass instance with clang cursor and source directory"""
-		self.generate_href = generate_href
-		self.ropen = "\n<tr><td>\n"
-		self.rclose = "\n</td></tr>\n"
-		# where are we at?
-		self.filename = os.path.abspath(cursor.location.file.name).strip()
-		# store a relative path for hrefs as well
-		# dbmsg.debug(f"{self.filename},{absDirectory}")
-		# JME fixme. fubar on Windows with different drive names :\\\\
-		# self.relname = os.path.relpath(self.filename,absDirectory).strip()
-		self.relname = ""
-		self.line = cursor.location.line
-		# the fully qualified name as in a::b::c
-		self.fqn = None
-		if cursor.kind == clang.cindex.CursorKind.CLASS_TEMPLATE:
-			# process declarations like:
-			# template <typename T> class MyClass
-			self.fqn = cursor.spelling
-		else:
-			# process declarations like:
-			# class MyClass or struct MyStruct
-			self.fqn = cursor.type.spelling
-		# 
-		self.parents = []
-		self.privateFields = []
-		self.privateMethods = []
-		self.publicFields = []
-		self.publicMethods = []
-		self.protectedFields = []
-		self.protectedMethods = []
+#------------------------------------------------------------------------------
+class DigestWriter:
+	""" write-through text stream that keeps a sha256 of what went through it """
 
 	#--------------------------------------------------------------------------
-	def _genFields(self, accessPrefix, fields) -> str:
-		""" generate UML HTML string for all class member variables"""
-		# sort by fieldName
-		#fields = sorted(fields, key=lambda x: x[0])
-		ret = ""
-		if len(fields) > 0:
-			ret = self.ropen
-			for fieldName, fieldTypes in fields:
-				ret += f"{accessPrefix} {html.escape(fieldName)} : {html.escape(fieldTypes[0])} <br />"
-			ret += self.rclose
-		return ret
+	def __init__(self, out):
+		self.out = out
+		self.sha = hashlib.sha256()
+		# bytes written
+		self.size = 0
 
 	#--------------------------------------------------------------------------
-	def _genMethods(self, accessPrefix, methods) -> str:
-		""" generate UML HTML string for all class member functions"""
-		# sort by methodName
-		offset = 1
-		# methods = sorted(methods, key=lambda x: x[offset])
-		ret = ""
-		if len(methods) > 0:
-			ret = self.ropen
-			for (static, virtual, returnType, methodName, methodArgs) in methods:
-				ret += f"{accessPrefix} {static} {virtual} {html.escape(methodName)}{html.escape(methodArgs)} : {html.escape(returnType)} <br />"
-			ret += self.rclose
-		return ret
+	def write(self, text : str) -> int:
+		data = text.encode()
+		self.sha.update(data)
+		self.size += len(data)
+		return self.out.write(text)
 
 	#--------------------------------------------------------------------------
-	def addParentByFQN(self, fullyQualifiedClassName):
-		""" add fully qualified with namespaces etc """
-		self.parents.append(fullyQualifiedClassName)
+	def hexdigest(self) -> str:
+		return self.sha.hexdigest()
+
+#------------------------------------------------------------------------------
+class DotGenerator:
+	""" Generate a DOT script """
+
+	# HTML table row
+	ropen = "\n<tr><td>\n"
+	rclose = "\n</td></tr>\n"
 
 	#--------------------------------------------------------------------------
-	def getId(self) -> str:
-		""" generate a unique label for graphviz """
-		# sad but required to avoid problems with graphviz IDs
-		return self.getFQN().replace("::","__")
+	def __init__(self, generateHref : bool = True):
+		""" constructor. generateHref adds a file:/// link to each class """
+		self.generateHref = generateHref
+		self.classes = {}
 
 	#--------------------------------------------------------------------------
-	def getFQN(self) -> str:
-		""" get the fully qualified classname"""
-		return self.fqn
+	def hasClass(self, aClass) -> bool:
+		""" check to see if a fully qualified classname has been mapped"""
+		return self.classes.get(aClass) is not None
 
 	#--------------------------------------------------------------------------
-	def getUQN(self) -> str:
-		""" get the unqualified classname"""
-		parts = str.split(self.getId(),"__")
-		return parts[-1]
+	#
+	def addClass(self, aClass) -> None:
+		""" map fully qualified classname to class descriptor instance """
+		self.classes[aClass.fqn] = aClass
 
 	#--------------------------------------------------------------------------
-	def getNamespace(self) -> str:
-		""" get the fully namespace as a string"""
-		ns = ""
-		parts:list[str] = str.split(self.getId(),"__")
-		if len(parts) > 0:
-			ns = "__".join(parts[:-1])
-		return ns
+	#
+	def subset(self, fqns) -> "DotGenerator":
+		""" a generator holding the named classes plus every mapped class reachable
+		from them via inheritance or association """
+		wanted = set()
+		pending = [ fqn for fqn in fqns if fqn in self.classes ]
+		while len(pending) > 0:
+			fqn = pending.pop()
+			if fqn in wanted:
+				continue
+			wanted.add(fqn)
+			aClass = self.classes[fqn]
+			for parent in aClass.parents:
+				if parent in self.classes:
+					pending.append(parent)
+			for access, fieldName, fieldTypes in aClass.fields:
+				for fieldType in fieldTypes:
+					if fieldType in self.classes:
+						pending.append(fieldType)
+		# keep the mapping order
+		generator = DotGenerator(self.generateHref)
+		for fqn, aClass in self.classes.items():
+			if fqn in wanted:
+				generator.addClass(aClass)
+		return generator
 
 	#--------------------------------------------------------------------------
-	def getInnerNamespace(self) -> str:
-		""" get the innermost namespace as a string"""
-		ns = ""
-		parts = str.split(self.getId(),"__")
-		if len(parts) > 1:
-			ns = parts[-2]
-			# dbmsg.debug(f"{self.getId()} -> {ns}")
-		return ns
+	def _related(self, aClass : UmlClass) -> list:
+		""" the mapped classes aClass derives from or holds """
+		related = [ parent for parent in aClass.parents if parent in self.classes ]
+		related += [ t for access, name, types in aClass.fields for t in types if t in self.classes ]
+		return related
 
 	#--------------------------------------------------------------------------
-	def getNamespaceDepth(self) -> int:
-		""" how deep is the namespace nesting. global == 0 """
+	#
+	def query(self, rootPattern : str = "", hops : int = -1, direction : str = "both", maxNodes : int = 0) -> "DotGenerator":
+		""" a generator holding the classes whose name matches rootPattern (re.search, empty == all)
+		and every class within hops inheritance or association steps of them. hops < 0 == no limit.
+		direction "ancestors" walks towards base classes and the types a class holds,
+		"descendants" towards subclasses and the classes holding it, "both" either way.
+		maxNodes > 0 keeps only the nearest maxNodes classes """
+		if direction not in ("both", "ancestors", "descendants"):
+			raise Exception(f"Unknown query direction {direction}")
+		# fqn -> mapped classes it derives from or holds, and the reverse
+		up = {}
+		down = {}
+		for fqn, aClass in self.classes.items():
+			targets = self._related(aClass)
+			up[fqn] = targets
+			for target in targets:
+				down.setdefault(target, []).append(fqn)
+		rootRe = re.compile(rootPattern) if rootPattern else None
+		roots = sorted(fqn for fqn in self.classes if rootRe is None or rootRe.search(fqn) is not None)
+		# breadth first, so a node cap keeps the nearest classes
+		distance = { fqn : 0 for fqn in roots }
+		frontier = roots
 		depth = 0
-		parts = str.split(self.getId(),"__")
-		if len(parts) > 0:
-			depth = len(parts) - 1
-		return depth
+		while len(frontier) > 0 and (hops < 0 or depth < hops):
+			depth += 1
+			following = []
+			for fqn in frontier:
+				neighbours = set()
+				if direction != "descendants":
+					neighbours.update(up.get(fqn, []))
+				if direction != "ancestors":
+					neighbours.update(down.get(fqn, []))
+				for neighbour in sorted(neighbours):
+					if neighbour not in distance:
+						distance[neighbour] = depth
+						following.append(neighbour)
+			frontier = following
+		wanted = sorted(distance, key=lambda fqn: (distance[fqn], fqn))
+		if maxNodes > 0:
+			wanted = wanted[:maxNodes]
+		wanted = set(wanted)
+		# keep the mapping order
+		generator = DotGenerator(self.generateHref)
+		for fqn, aClass in self.classes.items():
+			if fqn in wanted:
+				generator.addClass(aClass)
+		return generator
+
+	#--------------------------------------------------------------------------
+	#
+	def partition(self, by : str, maxNodes : int) -> list:
+		""" split into [(label, DotGenerator)] parts of about maxNodes classes.
+		by "components" keeps weakly connected components (inheritance or association)
+		whole, so no edge is lost. by "namespaces" keeps top-level namespaces whole,
+		edges between them are dropped. Small groups are packed together, largest first,
+		and a group bigger than maxNodes gets a part of its own """
+		groups = {}
+		if by == "components":
+			# union-find over the mapped edges
+			leader = { fqn : fqn for fqn in self.classes }
+			def find(fqn):
+				while leader[fqn] != fqn:
+					leader[fqn] = leader[leader[fqn]]
+					fqn = leader[fqn]
+				return fqn
+			for fqn, aClass in self.classes.items():
+				for target in self._related(aClass):
+					a, b = find(fqn), find(target)
+					if a != b:
+						leader[max(a, b)] = min(a, b)
+			for fqn in self.classes:
+				groups.setdefault(find(fqn), []).append(fqn)
+		elif by == "namespaces":
+			for fqn in self.classes:
+				parts = splitQualifiedName(fqn)
+				groups.setdefault(parts[0] if len(parts) > 1 else "global", []).append(fqn)
+		else:
+			raise Exception(f"Unknown partitioning {by}")
+		# (labels, fqns) bins. first fit, biggest groups first, ties by name for stable output
+		bins = []
+		for key in sorted(groups, key=lambda key: (-len(groups[key]), key)):
+			group = groups[key]
+			for labels, fqns in bins:
+				if len(fqns) + len(group) <= maxNodes:
+					labels.append(key)
+					fqns.update(group)
+					break
+			else:
+				bins.append(([ key ], set(group)))
+		parts = []
+		for labels, fqns in bins:
+			generator = DotGenerator(self.generateHref)
+			for fqn, aClass in self.classes.items():
+				if fqn in fqns:
+					generator.addClass(aClass)
+			label = labels[0] if len(labels) == 1 else f"{labels[0]} + {len(labels) - 1} more"
+			parts.append((label, generator))
+		return parts
+
+	#--------------------------------------------------------------------------
+	# 
+	def count(self) -> int:
+		""" how many classes? """
+		return len(self.classes)
+
+	#--------------------------------------------------------------------------
+	def sortedClasses(self) -> list:
+		""" classes in a stable order, independent of which TU mapped them first """
+		return [ self.classes[key] for key in sorted(self.classes) ]
+
+	#--------------------------------------------------------------------------
+	def _writeFields(self, out, accessPrefix, fields) -> None:
+		""" write UML HTML rows for all class member variables"""
+		if len(fields) > 0:
+			out.write(self.ropen)
+			for fieldName, fieldTypes in fields:
+				out.write(f"{accessPrefix} {html.escape(fieldName)}: {html.escape(fieldTypes[0])} <br />")
+			out.write(self.rclose)
 
 	#--------------------------------------------------------------------------
-	def getLocation(self) -> str:
-		""" where are we defined in a source file? """
-		return str(f"{self.filename}:{self.line}\n")
+	def _writeMethods(self, out, accessPrefix, methods) -> None:
+		""" write UML HTML rows for all class member functions"""
+		if len(methods) > 0:
+			out.write(self.ropen)
+			for (static, virtual, returnType, methodName, methodArgs) in methods:
+				out.write(f"{accessPrefix} {static} {virtual} {html.escape(methodName)}{html.escape(methodArgs)}: {html.escape(returnType)} <br />")
+			out.write(self.rclose)
 
 	#--------------------------------------------------------------------------
-	def isUnamed(self) -> bool:
-		""" dump unamed structs  """
-		ret = "(unnamed struct" in self.fqn
-		return ret
+	def writeClass(self, out, aClass : UmlClass) -> None:
+		""" write a DOT HTML label for a class """
+		out.write(f"{aClass.getId()}[ label = <<table border=\"0\" rows=\"*\">")
+		out.write(f"{self.ropen}{html.escape(aClass.getUQN())}{self.rclose}")
+		# host-dependent. improve.
+		if self.generateHref:
+			# ugly but provides navigation to the target file
+			out.write(f"\n<tr><td href=\"file:///{aClass.filename}\">\n{aClass.filename}:{aClass.line}{self.rclose}")
+		for access in accessOrder:
+			self._writeFields(out, access, aClass.getFields(access))
+			self._writeMethods(out, access, aClass.getMethods(access))
+		out.write("</table>> ]\n")
 
 	#--------------------------------------------------------------------------
-	def isAnonymous(self) -> bool:
-		""" dump anonymous structs  """
-		ret = "(anonymous struct" in self.fqn
-		# if ret:
-		#    dbmsg.debug(f"anon: -> {self.fqn}")
-		return ret
+	def writeCompactClass(self, out, aClass : UmlClass) -> None:
+		""" a plain DOT label for a class: its name and member counts. much cheaper to lay out """
+		name = aClass.getUQN().replace("\\", "\\\\").replace("\"", "\\\"")
+		out.write(f"{aClass.getId()}[ label = \"{name}\\n{len(aClass.fields)} field(s), {len(aClass.methods)} method(s)\" ]\n")
 
 	#--------------------------------------------------------------------------
-	def _genAssociations(self,fields,classes) -> dict:
+	def _genAssociations(self, aClass : UmlClass, fields) -> dict:
 		""" generate DOT association strings """
 		# ach!
 		astr:str = "[constraint=false, arrowtail=odiamond]\n"
@@ -157,264 +278,117 @@ class UmlClass:
 		edges = dict()
 		for fieldName, fieldTypes in fields:
 			for fieldType in fieldTypes:
-				if fieldType in classes:
-					c = classes[fieldType]
+				if fieldType in self.classes:
+					c = self.classes[fieldType]
 					# check for multiple association(s)
 					key = c.getId() 
 					if key in edges:
-						edges[key] = f"{key} -> {self.getId()} {mstr}"
+						edges[key] = f"{key} -> {aClass.getId()} {mstr}"
 					else:
-						edges[key] = f"{key} -> {self.getId()} {astr}"
+						edges[key] = f"{key} -> {aClass.getId()} {astr}"
 		return edges
 
 	#--------------------------------------------------------------------------
-	def genAssociations(self, classes) -> str:
-		associations:str = ""
-		edges = self._genAssociations(self.privateFields,classes)
-		for k,v in edges.items():
-			associations += v
-		edges = self._genAssociations(self.publicFields,classes)
-		for k,v in edges.items():
-			associations += v
-		return associations
+	def writeAssociations(self, out, aClass : UmlClass) -> None:
+		""" write DOT association edges for the private and public fields of a class """
+		for fields in (aClass.getFields(PRIVATE), aClass.getFields(PUBLIC)):
+			for k,v in self._genAssociations(aClass, fields).items():
+				out.write(v)
 
 	#--------------------------------------------------------------------------
-	def genInheritances(self, classes, iStyle : str = "") -> str:
-		""" generate edge labels from aClass to 1+ superclass(es) """
-		edges = ""
-		for parent in self.parents:
-			if parent in classes:
-				c = classes[parent]
-				edges += f"{c.getId()} -> {self.getId()}\n"
-		return edges
-
-	#--------------------------------------------------------------------------
-	def GenerateDot(self) -> str:
-		""" generate a DOT HTML label for this instance """
-		ret = f"{self.getId()}[ label = <<table border=\"0\" rows=\"*\">"
-		# ret = f"{self.getId()}[ label = <<table border=\"0\">"
-		ret += f"{self.ropen}{html.escape(self.getUQN())}{self.rclose}"
-		# host-dependent. improve.
-		if self.generate_href:
-			# ugly but provides navigation to the target file
-			ret += f"\n<tr><td href=\"file:///{self.filename}\">\n{self.filename}:{self.line}{self.rclose}"
-			# 
-		else:
-			# make these file local
-			# ret += f"{self.ropen}{self.filename}:{self.line}{self.rclose}"
-			pass
-		ret += f"{self._genFields('+',self.publicFields)}"
-		ret += f"{self._genMethods('+',self.publicMethods)}"
-		ret += f"{self._genFields('#',self.protectedFields)}"
-		ret += f"{self._genMethods('#',self.protectedMethods)}"
-		ret += f"{self._genFields('-',self.privateFields)}"
-		ret += f"{self._genMethods('-',self.privateMethods)}"
-		ret += "</table>> ]\n"
-		return ret
+	def writeInheritances(self, out, aClass : UmlClass) -> None:
+		""" write edges from aClass to 1+ superclass(es) """
+		for parent in aClass.parents:
+			if parent in self.classes:
+				c = self.classes[parent]
+				out.write(f"{c.getId()} -> {aClass.getId()}\n")
 
 	#--------------------------------------------------------------------------
-	def _processClassField(self,cursor):
-		""" Returns the name and the type of the given class field.
-		The cursor must be of kind CursorKind.FIELD_DECL"""
-		# the first element of types is for display purpose. Form 2nd to Nth element, 
-		# they are template type argurment in the chain list
-		types = list()
-		fieldChilds = list(cursor.get_children())
-		if len(fieldChilds) == 0:  # if there are not cursorchildren, the type is some primitive datatype
-			types.append(cursor.type.spelling)
-		else:  # if there are cursorchildren, the type is some non-primitive datatype (a class or class template)
-			types.append(cursor.type.spelling)
-			for cc in fieldChilds:
-				if cc.kind == clang.cindex.CursorKind.TEMPLATE_REF:
-					types.append(cc.spelling)
-				elif cc.kind == clang.cindex.CursorKind.TYPE_REF:
-					types.append(cc.type.spelling)
-		name = cursor.spelling
-		return name, types
-
-
-	#------------------------------------------------------------------------------
-	def _processClassMemberDeclaration(self, cursor):
-		""" Processes a cursor corresponding to a class member declaration and
-		appends the extracted information to the given umlClass """
-		s = "static" if cursor.is_static_method() else ""
-		v = "virtual" if cursor.is_virtual_method() else ""
-		if cursor.kind == clang.cindex.CursorKind.CXX_BASE_SPECIFIER:
-			for baseClass in cursor.get_children():
-				if baseClass.kind == clang.cindex.CursorKind.TEMPLATE_REF:
-					self.parents.append(baseClass.spelling)
-				elif baseClass.kind == clang.cindex.CursorKind.TYPE_REF:
-					self.parents.append(baseClass.type.spelling)
-		# non static data member
-		elif cursor.kind == clang.cindex.CursorKind.FIELD_DECL:
-			name, types = self._processClassField(cursor)
-			if name is not None and types is not None:
-				if cursor.access_specifier == clang.cindex.AccessSpecifier.PUBLIC:
-					self.publicFields.append((name, types))
-				elif cursor.access_specifier == clang.cindex.AccessSpecifier.PRIVATE:
-					self.privateFields.append((name, types))
-				elif cursor.access_specifier == clang.cindex.AccessSpecifier.PROTECTED:
-					self.protectedFields.append((name, types))
-		elif cursor.kind == clang.cindex.CursorKind.CXX_METHOD or\
-				cursor.kind == clang.cindex.CursorKind.CONSTRUCTOR or\
-				cursor.kind == clang.cindex.CursorKind.DESTRUCTOR:
-			try:
-				returnType, argumentTypes = cursor.type.spelling.split(' ', 1)
-				# s = "static" if cursor.is_static_method() else ""
-				# v = "virtual" if cursor.is_virtual_method() else ""
-				if cursor.access_specifier == clang.cindex.AccessSpecifier.PUBLIC:
-					self.publicMethods.append((s,v,returnType, cursor.spelling, argumentTypes))
-				elif cursor.access_specifier == clang.cindex.AccessSpecifier.PRIVATE:
-					self.privateMethods.append((s,v,returnType, cursor.spelling, argumentTypes))
-				elif cursor.access_specifier == clang.cindex.AccessSpecifier.PROTECTED:
-					self.protectedMethods.append((s,v,returnType, cursor.spelling, argumentTypes))
-			except:
-				dbmsg.debug("Error Invalid declaration: {cursor.type.spelling}")
-		elif cursor.kind == clang.cindex.CursorKind.FUNCTION_TEMPLATE:
-			# s = "static" if cursor.is_static_method() else ""
-			# v = "virtual" if cursor.is_virtual_method() else ""
-			returnType, argumentTypes = cursor.type.spelling.split(' ', 1)
-			if cursor.access_specifier == clang.cindex.AccessSpecifier.PUBLIC:
-				self.publicMethods.append((s,v,returnType, cursor.spelling, argumentTypes))
-			elif cursor.access_specifier == clang.cindex.AccessSpecifier.PRIVATE:
-				self.privateMethods.append((s,v,returnType, cursor.spelling, argumentTypes))
-			elif cursor.access_specifier == clang.cindex.AccessSpecifier.PROTECTED:
-				self.protectedMethods.append((s,v,returnType, cursor.spelling, argumentTypes))
-
-	#--------------------------------------------------------------------------
-	def Process(self,cursor):
-		""" process this class """
-		# print(cursor.kind)
-		for c in cursor.get_children():
-			# print(c.kind)
-			# process member variables and methods declarations
-			self._processClassMemberDeclaration(c)
-
-#------------------------------------------------------------------------------
-class DotGenerator:
-	""" Generate a DOT script """
-
-	#--------------------------------------------------------------------------
-	def __init__(self):
-		""" constructor """
-		self.classes = {}
-
-	#--------------------------------------------------------------------------
-	def hasClass(self, aClass) -> bool:
-		""" check to see if a fully qualified classname has been mapped"""
-		return self.classes.get(aClass) is not None
-
-	#--------------------------------------------------------------------------
-	#
-	def addClass(self, aClass) -> None:
-		""" map fully qualified classname to class descriptor instance """
-		self.classes[aClass.fqn] = aClass
-
-	#--------------------------------------------------------------------------
-	# 
-	def count(self) -> int:
-		""" how many classes? """
-		return len(self.classes)
-
-	#--------------------------------------------------------------------------
-	def genNamespaces(self) -> str:
-		""" generate 0+ DOT subgraph definitions labelled by namespace. """
+	def writeNamespaces(self, out) -> None:
+		""" write 0+ DOT subgraph definitions labelled by namespace. """
 		# clang does not provide a clean namespace entry/exit token
 		# it has to be inferred from the fully qualifed name, which is :: delimited
 		# we want to generate final set of DOT strings that do something like this:
 		# subgraph cluster_1 { label="A" test__A, test__B, test__C, test__D
 		# subgraph cluster_2 { label="E" test__E } }
 		# which clusters all of the classes parsed in the TU.
-		# so what we want is a dictionary where the key is the namespace and the value
-		# is a list of class names within it
-		# 'global' -> [ 'g1', 'g2', ...]
-		#  no, forget global. always implicit thus:
-		# 'ns' -> [ 'g3', 'g4', ...]
-		# 'ns::ns2' -> [ 'g4', 'g5', ...]
-		#
-		nameSpaces = ""
-		curdepth = 0
+		# so we build a tree of namespaces, each holding the ids of the classes
+		# directly within it, and emit it depth first in name order.
+		# global classes are implicit and never clustered.
+		root = { "children" : {}, "ids" : [] }
+		for umlClass in self.sortedClasses():
+			scopes = splitQualifiedName(umlClass.fqn)[:-1]
+			if len(scopes) == 0:
+				continue
+			node = root
+			for scope in scopes:
+				node = node["children"].setdefault(scope, { "children" : {}, "ids" : [] })
+			node["ids"].append(umlClass.getId())
+		# explicit stack of (label, node, closing?) to avoid recursion
 		cluster = 0
-		depth = 0
-		ns = ""
-		for key, umlClass in self.classes.items():
-			# track the current values
-			curns = umlClass.getNamespace()
-			if curns == "":
+		# the first cluster starts on a line of its own
+		atLineStart = False
+		pending = [ (name, root["children"][name], False) for name in sorted(root["children"], reverse=True) ]
+		while len(pending) > 0:
+			label, node, closing = pending.pop()
+			if closing:
+				out.write("}\n")
+				atLineStart = True
 				continue
-			curdepth = umlClass.getNamespaceDepth()
-			# dbmsg.debug(f"{ns} {curns} {ns == curns} : {depth} {curdepth}")
-			# potentially depth changes might be > 1 so we need to 
-			# account for these eventualities. 
-			if  curdepth > depth:
-				nsdepth = curdepth
-				braces = ""
-				while nsdepth > depth:
-					braces += "{"
-					nsdepth -= 1
-				nameSpaces += f"\nsubgraph cluster_{cluster} {braces} label=\"{umlClass.getInnerNamespace()}\" {umlClass.getId()} "
-				cluster += 1
-			elif curdepth < depth:
-				nsdepth = curdepth
-				braces = ""
-				while nsdepth < depth:
-					braces += "}"
-					nsdepth += 1
-				nameSpaces += f" {braces}\n"
-			elif curns != ns and curdepth == depth:
-				nameSpaces += f"}}\nsubgraph cluster_{cluster} {{ label=\"{umlClass.getInnerNamespace()}\" {umlClass.getId()} "
-				cluster += 1
-			elif curdepth > 0:
-				nameSpaces += f"{umlClass.getId()} "
-			# stash ...
-			ns = curns
-			depth = curdepth
-		while curdepth > 0:
-			curdepth -= 1
-			nameSpaces += "}\n"
-		return nameSpaces
+			if not atLineStart:
+				out.write("\n")
+			ids = " ".join(node["ids"])
+			out.write(f"subgraph cluster_{cluster} {{ label=\"{label}\" {ids} ")
+			atLineStart = False
+			cluster += 1
+			pending.append((label, node, True))
+			for name in sorted(node["children"], reverse=True):
+				pending.append((name, node["children"][name], False))
 
 	#--------------------------------------------------------------------------
-	# 
-	def generate(self,generateNamespaces) -> str:
-		""" generate the DOT file content """
+	def genNamespaces(self) -> str:
+		""" generate 0+ DOT subgraph definitions labelled by namespace. """
+		out = io.StringIO()
+		self.writeNamespaces(out)
+		return out.getvalue()
+
+	#--------------------------------------------------------------------------
+	def write(self, out, generateNamespaces, compact : bool = False) -> None:
+		""" stream the DOT file content to an open text file. compact labels each class
+		with its name and member counts only, without links """
+		# always the same order so that unchanged input gives byte identical output
+		sortedClasses = self.sortedClasses()
+		# JME needs to be an option somehow
+		out.write("\n// Paste into https://graphviz.christine.website/ to experiment. great stuff.\n")
+		out.write("digraph UML {\n")
+		out.write("node [fontname = \"Helvetica,Arial,sans-serif\" margin=0 fontcolor=black fontsize=8 width=0.5 shape=box style=filled]\n")
+		out.write("edge [fontname = \"Helvetica,Arial,sans-serif\" fontsize = 8 dir=back, arrowtail=empty]\n")
 		# fully qualified classname (std::string) -> UmlClass instance
-		classes = ""
-		for key, value in self.classes.items():
-			classes += value.GenerateDot()
+		out.write("// classes\n")
+		writeClass = self.writeCompactClass if compact else self.writeClass
+		for aClass in sortedClasses:
+			writeClass(out, aClass)
 		# associations
-		associations = ""
-		for key, aClass in self.classes.items():
-			associations += aClass.genAssociations(self.classes)
+		out.write("\n// has-a (uses/ownership/association)\n")
+		for aClass in sortedClasses:
+			self.writeAssociations(out, aClass)
 		# inheritances
-		inheritances = ""
-		for key, aClass in self.classes.items():
-			inheritances += aClass.genInheritances(self.classes)
+		out.write("\n// is-a (inheritance)\n")
+		for aClass in sortedClasses:
+			self.writeInheritances(out, aClass)
 		# These get modelled as DOT (nested) subgraphs
 		# GOK how to style them so we do not! Any examples welcomed.
 		# subgraph cluster_A { label="A" test__A, test__B, test__C, test__D
 		# subgraph cluster_E { label="E" test__E } }
-		namespaces = ""
+		out.write("\n// subgraphs for namespaces\n")
 		if generateNamespaces:
-			namespaces = self.genNamespaces()
+			self.writeNamespaces(out)
+		out.write("\n//\n} // EOF\n\n")
 
-		# JME needs to be an option somehow
-		dotContent = f"""
-					// Paste into https://graphviz.christine.website/ to experiment. great stuff.
-					digraph UML {{
-						node [fontname = \"Helvetica,Arial,sans-serif\" margin=0 fontcolor=black fontsize=8 width=0.5 shape=box style=filled]
-						edge [fontname = \"Helvetica,Arial,sans-serif\" fontsize = 8 dir=back, arrowtail=empty]
-						// classes
-						{classes}
-						// has-a (uses/ownership/association)
-						{associations}
-						// is-a (inheritance)
-						{inheritances}
-						// subgraphs for namespaces
-						{ namespaces }
-						//
-						}} // EOF\n
-						"""
-		# clear out rubbish from triple quote strings
-		dotContent = re.sub(r'(^[ \t]+|[ \t]+(?=:))', '', dotContent, flags=re.M)
-		return dotContent
+	#--------------------------------------------------------------------------
+	# 
+	def generate(self,generateNamespaces) -> str:
+		""" generate the DOT file content """
+		out = io.StringIO()
+		self.write(out, generateNamespaces)
+		return out.getvalue()
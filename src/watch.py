@@ -0,0 +1,186 @@
+#
+#	BSD 3-Clause License
+#
+#   Copyright (c) 2022, Jerry Evans
+#   All rights reserved.
+#   See LICENCE.md for full details
+#
+
+import os
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+
+#------------------------------------------------------------------------------
+class PollingWatcher:
+	""" Notice changes by comparing file stats, and directory listings for new
+	files, every interval seconds. Works anywhere. """
+
+	name = "polling"
+	# seconds between looks
+	interval = 0.5
+
+	#--------------------------------------------------------------------------
+	def __init__(self):
+		""" constructor """
+		self.files = set()
+		self.directories = set()
+		# path -> (mtime, size), None if missing. directory -> set of names
+		self.stats = {}
+		self.listings = {}
+
+	#--------------------------------------------------------------------------
+	def _stat(self, path : str) -> tuple:
+		try:
+			st = os.stat(path)
+			return (st.st_mtime_ns, st.st_size)
+		except OSError:
+			return None
+
+	#--------------------------------------------------------------------------
+	def _list(self, directory : str) -> set:
+		try:
+			return set(os.listdir(directory))
+		except OSError:
+			return set()
+
+	#--------------------------------------------------------------------------
+	def setFiles(self, files : set, directories : set) -> None:
+		""" watch these files for changes and these directories for files coming and going """
+		self.files = set(files)
+		self.directories = set(directories)
+		self.stats = { path : self._stat(path) for path in self.files }
+		self.listings = { directory : self._list(directory) for directory in self.directories }
+
+	#--------------------------------------------------------------------------
+	def _changes(self) -> set:
+		""" paths changed since the last look """
+		changed = set()
+		for path, before in self.stats.items():
+			now = self._stat(path)
+			if now != before:
+				self.stats[path] = now
+				changed.add(path)
+		for directory, before in self.listings.items():
+			now = self._list(directory)
+			if now != before:
+				self.listings[directory] = now
+				changed.update(os.path.join(directory, name) for name in now ^ before)
+		return changed
+
+	#--------------------------------------------------------------------------
+	def wait(self, timeout : float = None) -> set:
+		""" block until something changes, or for timeout seconds. returns the changed paths """
+		deadline = None if timeout is None else time.monotonic() + timeout
+		while True:
+			changed = self._changes()
+			if len(changed) > 0:
+				return changed
+			if deadline is not None and time.monotonic() >= deadline:
+				return changed
+			pause = self.interval if deadline is None else min(self.interval, max(0, deadline - time.monotonic()))
+			time.sleep(pause)
+
+	#--------------------------------------------------------------------------
+	def close(self) -> None:
+		pass
+
+#------------------------------------------------------------------------------
+class InotifyWatcher:
+	""" Linux inotify through libc, no extra packages. Directories are watched,
+	so an editor saving by rename is seen too. """
+
+	name = "inotify"
+	# IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+	mask = 0x002 | 0x008 | 0x040 | 0x080 | 0x100 | 0x200
+	# IN_Q_OVERFLOW. events were lost
+	overflow = 0x4000
+
+	#--------------------------------------------------------------------------
+	def __init__(self):
+		""" constructor. raises OSError if inotify is not available """
+		libcName = ctypes.util.find_library("c")
+		self.libc = ctypes.CDLL(libcName, use_errno=True)
+		if not hasattr(self.libc, "inotify_init1"):
+			raise OSError("No inotify")
+		self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+		if self.fd < 0:
+			raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+		self.files = set()
+		# watch descriptor -> directory, and back
+		self.watches = {}
+		self.directories = {}
+
+	#--------------------------------------------------------------------------
+	def setFiles(self, files : set, directories : set) -> None:
+		""" watch these files for changes and these directories for files coming and going """
+		self.files = set(files)
+		wanted = set(directories) | set(os.path.dirname(path) for path in self.files)
+		for directory in list(self.directories):
+			if directory not in wanted:
+				wd = self.directories.pop(directory)
+				self.watches.pop(wd, None)
+				self.libc.inotify_rm_watch(self.fd, wd)
+		for directory in wanted:
+			if directory in self.directories:
+				continue
+			wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.mask)
+			# gone already? the parent's events cover it
+			if wd >= 0:
+				self.directories[directory] = wd
+				self.watches[wd] = directory
+
+	#--------------------------------------------------------------------------
+	def _read(self) -> set:
+		""" drain pending events into changed paths """
+		changed = set()
+		while True:
+			try:
+				data = os.read(self.fd, 65536)
+			except BlockingIOError:
+				return changed
+			offset = 0
+			while offset < len(data):
+				# struct inotify_event { int wd; uint32_t mask, cookie, len; char name[len]; }
+				wd, mask, cookie, length = struct.unpack_from("iIII", data, offset)
+				offset += 16
+				name = data[offset:offset + length].rstrip(b"\0")
+				offset += length
+				if mask & self.overflow:
+					# lost track. everything may have changed
+					changed.update(self.files)
+				directory = self.watches.get(wd)
+				if directory is not None and name:
+					changed.add(os.path.join(directory, os.fsdecode(name)))
+
+	#--------------------------------------------------------------------------
+	def wait(self, timeout : float = None) -> set:
+		""" block until something changes, or for timeout seconds. returns the changed paths """
+		deadline = None if timeout is None else time.monotonic() + timeout
+		while True:
+			remaining = None if deadline is None else max(0, deadline - time.monotonic())
+			ready, _, _ = select.select([ self.fd ], [], [], remaining)
+			changed = self._read() if ready else set()
+			if len(changed) > 0 or (deadline is not None and time.monotonic() >= deadline):
+				return changed
+
+	#--------------------------------------------------------------------------
+	def close(self) -> None:
+		if self.fd >= 0:
+			os.close(self.fd)
+			self.fd = -1
+
+#------------------------------------------------------------------------------
+def createWatcher(method : str = "auto"):
+	""" inotify, polling, or auto: inotify where we can, polling otherwise """
+	if method not in ("auto", "inotify", "polling"):
+		raise Exception(f"Unknown watch method {method}")
+	if method != "polling":
+		try:
+			return InotifyWatcher()
+		except (OSError, AttributeError, TypeError):
+			if method == "inotify":
+				raise
+	return PollingWatcher()
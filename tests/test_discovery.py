@@ -0,0 +1,90 @@
+#
+#	BSD 3-Clause License
+#
+#   Copyright (c) 2022, Jerry Evans
+#   All rights reserved.
+#   See LICENCE.md for full details
+#
+#   .gitignore handling in FileFinder. python -m pytest tests
+#
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from src.discovery import FileFinder
+
+#------------------------------------------------------------------------------
+class IgnoreFileTests(unittest.TestCase):
+
+	#--------------------------------------------------------------------------
+	def setUp(self):
+		self.root = tempfile.mkdtemp(prefix="cppuml-discovery-")
+
+	#--------------------------------------------------------------------------
+	def tearDown(self):
+		shutil.rmtree(self.root, ignore_errors=True)
+
+	#--------------------------------------------------------------------------
+	def tree(self, files : list, ignores : dict):
+		""" empty files, and directory -> .gitignore text """
+		for name in files:
+			path = os.path.join(self.root, name)
+			os.makedirs(os.path.dirname(path), exist_ok=True)
+			open(path, "w").close()
+		for directory, text in ignores.items():
+			os.makedirs(os.path.join(self.root, directory), exist_ok=True)
+			with open(os.path.join(self.root, directory, ".gitignore"), "w") as f:
+				f.write(text)
+
+	#--------------------------------------------------------------------------
+	def found(self, useIgnoreFiles : bool = True) -> list:
+		finder = FileFinder([ "*.cpp" ], [], [], useIgnoreFiles, True)
+		return [ os.path.relpath(path, self.root).replace(os.sep, "/") for path in finder.find(self.root) ]
+
+	#--------------------------------------------------------------------------
+	def test_name_at_any_depth(self):
+		self.tree([ "a.cpp", "x/a.gen.cpp", "x/y/b.gen.cpp", "x/y/b.cpp" ], { "" : "*.gen.cpp\n" })
+		self.assertEqual(self.found(), [ "a.cpp", "x/y/b.cpp" ])
+
+	#--------------------------------------------------------------------------
+	def test_anchored(self):
+		self.tree([ "top.cpp", "sub/top.cpp", "sub/gen/a.cpp", "gen/b.cpp" ], { "" : "/top.cpp\n/gen/\n" })
+		self.assertEqual(self.found(), [ "sub/top.cpp", "sub/gen/a.cpp" ])
+
+	#--------------------------------------------------------------------------
+	def test_directory_only(self):
+		self.tree([ "old.cpp", "keep/old.cpp/a.cpp" ], { "" : "old.cpp/\n" })
+		self.assertEqual(self.found(), [ "old.cpp" ])
+
+	#--------------------------------------------------------------------------
+	def test_negation_last_match_wins(self):
+		self.tree([ "a.cpp", "keep.cpp", "x/keep.cpp" ], { "" : "*.cpp\n!keep.cpp\n" })
+		self.assertEqual(self.found(), [ "keep.cpp", "x/keep.cpp" ])
+
+	#--------------------------------------------------------------------------
+	def test_negated_set(self):
+		# any one character but a. ! included
+		self.tree([ "gena/a.cpp", "genb/b.cpp", "gen!/c.cpp" ], { "" : "gen[!a]/\n" })
+		self.assertEqual(self.found(), [ "gena/a.cpp" ])
+
+	#--------------------------------------------------------------------------
+	def test_double_star(self):
+		self.tree([ "docs/skip.cpp", "docs/x/y/skip.cpp", "docs/x/keep.cpp", "skip.cpp" ], { "" : "docs/**/skip.cpp\n" })
+		self.assertEqual(self.found(), [ "skip.cpp", "docs/x/keep.cpp" ])
+
+	#--------------------------------------------------------------------------
+	def test_nested_file_is_scoped(self):
+		self.tree([ "a.cpp", "sub/a.cpp", "sub/b.cpp", "sub/deeper/a.cpp", "other/a.cpp" ], { "sub" : "# local\n\na.cpp\n" })
+		self.assertEqual(self.found(), [ "a.cpp", "other/a.cpp", "sub/b.cpp" ])
+
+	#--------------------------------------------------------------------------
+	def test_ignore_files_off(self):
+		self.tree([ "a.cpp", "b.cpp" ], { "" : "a.cpp\n" })
+		self.assertEqual(self.found(False), [ "a.cpp", "b.cpp" ])
+
+#------------------------------------------------------------------------------
+if __name__ == "__main__":
+	unittest.main()